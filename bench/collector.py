@@ -0,0 +1,146 @@
+"""Minimal reference collector for /client/status.
+
+Accepts bare statuses (delta reporting off) and delta messages, gzip or plain,
+rebuilds every agent's full status with delta.merge_report and keeps it in
+memory. GET /stats returns request and byte counters and the process memory.
+
+    python -m bench.collector --port 8000
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import sys
+
+from delta import ResyncRequired, ack_response, merge_report
+
+
+class BadReport(ValueError):
+    """A body the collector cannot read, answered with 400"""
+
+
+class Collector:
+    def __init__(self):
+        self.agents = {}
+        self.requests = 0
+        self.bytes_in = 0
+        self.resyncs = 0
+        self.errors = 0
+
+    def handle_status(self, body, encoding):
+        self.requests += 1
+        self.bytes_in += len(body)
+        try:
+            if encoding == "gzip":
+                # a broken gzip stream is a BadGzipFile (an OSError) or an EOFError
+                body = gzip.decompress(body)
+            message = json.loads(body)
+        except (OSError, EOFError, ValueError) as error:
+            raise BadReport(f"unreadable body: {error}") from error
+        if not isinstance(message, dict):
+            raise BadReport(f"expected a json object, got {type(message).__name__}")
+        name = message.get("computer_name")
+        try:
+            state = merge_report(self.agents.get(name), message)
+        except ResyncRequired:
+            self.resyncs += 1
+            return 409, {"resync": True}
+        except (KeyError, TypeError, AttributeError) as error:
+            # e.g. a delta without "hash" or a "changed" that is not an object
+            raise BadReport(f"bad message: {error!r}") from error
+        self.agents[name] = state
+        if state["seq"] is None:
+            return 200, {"ok": True}
+        return 200, ack_response(state)
+
+    def stats(self):
+        return {"requests": self.requests, "bytes_in": self.bytes_in, "agents": len(self.agents),
+                "resyncs": self.resyncs, "errors": self.errors, "memory_bytes": memory_bytes()}
+
+    async def serve_connection(self, reader, writer):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                if method == "POST" and path == "/client/status":
+                    try:
+                        status, answer = self.handle_status(body, headers.get("content-encoding"))
+                    except BadReport:
+                        self.errors += 1
+                        status, answer = 400, {"error": "bad report"}
+                elif method == "GET" and path == "/stats":
+                    status, answer = 200, self.stats()
+                else:
+                    status, answer = 404, {"error": "not found"}
+                write_response(writer, status, answer)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def read_request(reader):
+    """One HTTP/1.1 request as (method, path, headers, body), None when the client hung up"""
+    line = await reader.readline()
+    if not line:
+        return None
+    method, path, _ = line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get("content-length", 0)))
+    return method, path, headers, body
+
+
+def write_response(writer, status, answer):
+    body = json.dumps(answer).encode()
+    reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 409: "Conflict"}[status]
+    writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+
+
+def memory_bytes():
+    """Resident memory of this process, None where it cannot be read"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+async def serve(host, port):
+    collector = Collector()
+    server = await asyncio.start_server(collector.serve_connection, host, port, backlog=1024)
+    # the simulator reads the port from this line
+    print(f"listening on {server.sockets[0].getsockname()[1]}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000, help="0 picks a free port")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,321 @@
+"""Simulates a fleet of agents reporting to a collector.
+
+Every virtual agent builds the real get_result() payload, with the checks
+replaced by fake data generators that run on the registry intervals, and
+posts it the way the transport does (compact json, gzip, optionally delta
+messages). For each fleet size, report interval and mode it prints
+requests/sec, p50/p99 latency, bytes per agent per hour and collector memory.
+
+Time is compressed by --speedup, so 20 cycles of a 30 second interval take
+a few seconds. Run from the project folder:
+
+    python -m bench.fleet --agents 100 1000 5000 --intervals 30 60 --modes full delta
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from delta import DeltaReporter
+from metrics import Metrics
+from registry import CHECKS
+from systen_checks import get_result
+
+FAILED_LOGIN_DAYS = 30
+
+
+def fake_system_version(agent):
+    return {"system_version": agent.os_release}
+
+
+def fake_anti_virus(agent):
+    if agent.rng.random() < 0.01:
+        agent.antivirus_up_to_date = not agent.antivirus_up_to_date
+    return {"antivirus_installed": True, "antivirus_enabled": True, "antivirus_up_to_date": agent.antivirus_up_to_date}
+
+
+def fake_windows_firewall_is_on(agent):
+    return {"windows_firewall_is_active": agent.rng.random() > 0.005}
+
+
+def fake_password_policy(agent):
+    return {"max_pass_age": 42, "min_pass_len": agent.min_pass_len}
+
+
+def fake_dok(agent):
+    if agent.rng.random() < 0.02:
+        agent.doks = agent.rng.randint(0, 2)
+    return {"number_of_connected_doks": agent.doks}
+
+
+def fake_chrome_version(agent):
+    if agent.rng.random() < 0.001:
+        agent.chrome_build += 1
+    return {"chrome_version": f"118.0.5993.{agent.chrome_build}"}
+
+
+def fake_login_events(agent):
+    if agent.rng.random() < 0.05:
+        today = agent.today()
+        agent.failed_logins[today] = agent.failed_logins.get(today, 0) + 1
+    return {"failed_login_event": dict(sorted(agent.failed_logins.items()))}
+
+
+FAKE_CHECKS = {
+    "system_version": fake_system_version,
+    "anti_virus": fake_anti_virus,
+    "windows_firewall_is_on": fake_windows_firewall_is_on,
+    "password_policy": fake_password_policy,
+    "dok": fake_dok,
+    "chrome_version": fake_chrome_version,
+    "login_events": fake_login_events,
+}
+
+
+class FakeAgent:
+    """One simulated endpoint, its checks run on simulated time"""
+
+    def __init__(self, index, seed):
+        self.rng = random.Random(seed * 100003 + index)
+        self.name = f"agent-{index:06d}"
+        self.os_release = self.rng.choice(["10", "11"])
+        self.antivirus_up_to_date = True
+        self.min_pass_len = self.rng.choice([8, 10, 12])
+        self.doks = 0
+        self.chrome_build = self.rng.randint(70, 120)
+        self.now = 0
+        self.failed_logins = {f"2026-09-{day:02d}": self.rng.randint(1, 5)
+                              for day in range(1, FAILED_LOGIN_DAYS + 1) if self.rng.random() < 0.2}
+        self.values = {}
+        self.check_status = {}
+        self.next_run = {check.name: 0 for check in CHECKS}
+        self.metrics = Metrics()
+
+    def today(self):
+        return f"2026-10-{1 + int(self.now // 86400) % 28:02d}"
+
+    def report(self, now):
+        """The payload this agent would send at simulated time `now`"""
+        self.now = now
+        for check in CHECKS:
+            if self.next_run[check.name] <= now:
+                self.values.update(FAKE_CHECKS[check.name](self))
+                self.check_status[check.name] = "ok"
+                self.metrics.observe("check_wall_seconds", self.rng.expovariate(20), check=check.name)
+                self.next_run[check.name] = now + check.interval * self.rng.uniform(0.9, 1.1)
+        self.metrics.observe("cycle_seconds", self.rng.expovariate(5))
+        report = dict(get_result())
+        report.update(self.values)
+        report["computer_name"] = self.name
+        report["check_status"] = dict(self.check_status)
+        report["check_errors"] = {}
+        report["agent_metrics"] = self.metrics.summary()
+        return report
+
+
+class ConnectionPool:
+    """Keep-alive HTTP/1.1 connections to the collector shared by all virtual agents"""
+
+    def __init__(self, host, port, size):
+        self.host = host
+        self.port = port
+        self.idle = asyncio.Queue()
+        for _ in range(size):
+            self.idle.put_nowait(None)
+
+    async def post(self, path, body, headers):
+        connection = await self.idle.get()
+        try:
+            for attempt in range(2):
+                if connection is None:
+                    connection = await asyncio.open_connection(self.host, self.port)
+                try:
+                    return await _exchange(connection, "POST", path, body, headers)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    # the collector closed an idle connection, reconnect once
+                    connection[1].close()
+                    connection = None
+                    if attempt:
+                        raise
+        finally:
+            self.idle.put_nowait(connection)
+
+    def close(self):
+        while not self.idle.empty():
+            connection = self.idle.get_nowait()
+            if connection is not None:
+                connection[1].close()
+
+
+async def _exchange(connection, method, path, body, headers):
+    reader, writer = connection
+    head = f"{method} {path} HTTP/1.1\r\nHost: collector\r\nContent-Length: {len(body)}\r\n"
+    head += "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+    writer.write(head.encode() + b"\r\n" + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    answer = await reader.readexactly(length)
+    try:
+        return status, json.loads(answer)
+    except ValueError:
+        return status, None
+
+
+def encode(message, compress):
+    # the same body the transport posts
+    body = json.dumps(message, separators=(",", ":")).encode()
+    headers = {"Content-Type": "application/json"}
+    if compress:
+        body = gzip.compress(body)
+        headers["Content-Encoding"] = "gzip"
+    return body, headers
+
+
+async def run_scenario(host, port, agents, interval, cycles, speedup, mode, compress, connections, seed):
+    pool = ConnectionPool(host, port, connections)
+    latencies = []
+    totals = {"bytes": 0, "errors": 0}
+
+    async def agent_loop(agent):
+        reporter = DeltaReporter(persist=False) if mode == "delta" else None
+        # agents start spread over the first interval, as the scheduler jitter does
+        await asyncio.sleep(agent.rng.uniform(0, interval / speedup))
+        for cycle in range(cycles):
+            status = agent.report(cycle * interval)
+            for _ in range(2):
+                body, headers = encode(reporter.build(status) if reporter else status, compress)
+                start = time.perf_counter()
+                try:
+                    code, answer = await pool.post("/client/status", body, headers)
+                except (OSError, asyncio.IncompleteReadError):
+                    totals["errors"] += 1
+                    break
+                latencies.append(time.perf_counter() - start)
+                totals["bytes"] += len(body)
+                if reporter:
+                    reporter.handle_response(code, answer)
+                if code != 409:
+                    break
+            await asyncio.sleep(interval / speedup * agent.rng.uniform(0.9, 1.1))
+
+    fleet = [FakeAgent(index, seed) for index in range(agents)]
+    start = time.perf_counter()
+    await asyncio.gather(*(agent_loop(agent) for agent in fleet))
+    elapsed = time.perf_counter() - start
+    pool.close()
+
+    latencies.sort()
+    return {
+        "agents": agents,
+        "interval": interval,
+        "mode": mode,
+        "gzip": compress,
+        "requests": len(latencies),
+        "errors": totals["errors"],
+        "requests_per_sec": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else None,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else None,
+        "bytes_per_agent_hour": totals["bytes"] / agents / (cycles * interval) * 3600,
+    }
+
+
+async def collector_stats(host, port):
+    connection = await asyncio.open_connection(host, port)
+    try:
+        return (await _exchange(connection, "GET", "/stats", b"", {}))[1]
+    finally:
+        connection[1].close()
+
+
+def start_collector():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen([sys.executable, "-m", "bench.collector", "--port", "0"],
+                               cwd=root, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line.startswith("listening on"):
+        process.kill()
+        raise RuntimeError("reference collector did not start")
+    return process, int(line.split()[-1])
+
+
+def run(args):
+    results = []
+    for agents in args.agents:
+        for interval in args.intervals:
+            for mode in args.modes:
+                if args.target:
+                    process = None
+                    host, port = args.target.rsplit(":", 1)
+                    port = int(port)
+                else:
+                    # a fresh collector per scenario, so its memory belongs to this fleet alone
+                    process, port = start_collector()
+                    host = "127.0.0.1"
+                try:
+                    result = asyncio.run(run_scenario(host, port, agents, interval, args.cycles, args.speedup, mode,
+                                                      not args.no_gzip, args.connections, args.seed))
+                    if process:
+                        stats = asyncio.run(collector_stats(host, port))
+                        result["collector_memory_mb"] = (stats["memory_bytes"] or 0) / 1024 / 1024
+                        result["resyncs"] = stats["resyncs"]
+                finally:
+                    if process:
+                        process.kill()
+                        process.wait()
+                results.append(result)
+                print_result(result)
+    return results
+
+
+def print_result(result):
+    memory = result.get("collector_memory_mb")
+    print(f"{result['agents']:>7} {result['interval']:>8}s {result['mode']:>6} {result['requests']:>9} "
+          f"{result['requests_per_sec']:>9.0f} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+          f"{result['bytes_per_agent_hour']:>12.0f} {'-' if memory is None else f'{memory:.1f}':>10}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--agents", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--intervals", type=int, nargs="+", default=[30], help="report interval in seconds")
+    parser.add_argument("--modes", nargs="+", choices=["full", "delta"], default=["full", "delta"])
+    parser.add_argument("--cycles", type=int, default=20, help="reports per agent")
+    parser.add_argument("--speedup", type=float, default=30, help="how much faster than real time to run")
+    parser.add_argument("--connections", type=int, default=64, help="keep-alive connections to the collector")
+    parser.add_argument("--no-gzip", action="store_true")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--target", help="host:port of a running collector instead of the reference one")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--max-bytes-per-agent-hour", type=float,
+                        help="exit with an error when a scenario sends more than this")
+    args = parser.parse_args()
+
+    print(f"{'agents':>7} {'interval':>9} {'mode':>6} {'requests':>9} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'B/agent/h':>12} {'coll. MB':>10}")
+    results = run(args)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.max_bytes_per_agent_hour:
+        over = [result for result in results if result["bytes_per_agent_hour"] > args.max_bytes_per_agent_hour]
+        if over:
+            print(f"FAIL: {len(over)} scenario(s) over {args.max_bytes_per_agent_hour:.0f} bytes per agent per hour")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
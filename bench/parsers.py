@@ -0,0 +1,65 @@
+"""Throughput of the check output parsers.
+
+Builds outputs shaped like what each check's command prints, from a handful
+of records up to an oversized Security log, and times the parser on them.
+Run from the project folder:
+
+    python -m bench.parsers --events 100 10000 200000
+"""
+import argparse
+import json
+import random
+import time
+
+from parsers import parse_chrome_version, parse_failed_logins, parse_password_policy, parse_usb_devices
+
+
+def usb_devices_output(count):
+    return json.dumps([{"FriendlyName": f"USB Flash Disk {index} USB Device"} for index in range(count)],
+                      separators=(",", ":")).encode()
+
+
+def failed_logins_output(count, seed=1):
+    rng = random.Random(seed)
+    events = []
+    for index in range(count):
+        day = rng.randint(1, 28)
+        events.append({"id": 100000 + index, "utc": f"2026-09-{day:02d}T{rng.randint(0, 23):02d}:00:00.0000000Z",
+                       "day": f"2026-09-{day:02d}"})
+    return json.dumps(events, separators=(",", ":")).encode()
+
+
+def measure(parser, output, min_seconds=0.2):
+    """Calls per second and MB per second of parser on output"""
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        parser(output)
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return calls / elapsed, len(output) * calls / elapsed / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, nargs="+", default=[100, 10000, 200000],
+                        help="failed login events per output")
+    args = parser.parse_args()
+
+    cases = [
+        ("password_policy", parse_password_policy, b'{"MaximumPasswordAge":42,"MinimumPasswordLength":7}'),
+        ("chrome_version", parse_chrome_version, b'{"DisplayVersion":"118.0.5993.89"}'),
+        ("dok", parse_usb_devices, usb_devices_output(3)),
+        ("dok", parse_usb_devices, usb_devices_output(500)),
+    ]
+    cases += [("login_events", parse_failed_logins, failed_logins_output(count)) for count in args.events]
+
+    print(f"{'parser':<16} {'bytes':>11} {'calls/s':>11} {'MB/s':>8}")
+    for name, parse, output in cases:
+        calls, megabytes = measure(parse, output)
+        print(f"{name:<16} {len(output):>11} {calls:>11.0f} {megabytes:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Fails when importing the service takes longer than the startup budget.
+
+Everything main.py imports at module level runs before the service can report
+RUNNING, and under the PyInstaller --onefile build that comes on top of
+unpacking. Run from the project folder:
+
+    python -m bench.startup --budget 0.25
+"""
+import argparse
+import importlib.util
+import statistics
+import subprocess
+import sys
+
+# main.py needs pywin32, without it the agent modules it imports are measured instead
+AGENT_MODULES = ["config", "executor", "metrics", "registry", "scheduler", "state"]
+
+# none of these may be loaded before the first check runs
+LAZY_MODULES = ["windows_tools", "requests", "eventlet", "systen_checks", "transport", "http.server"]
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+for module in {modules!r}:
+    __import__(module)
+elapsed = time.perf_counter() - start
+print(elapsed)
+print(",".join(module for module in {lazy!r} if module in sys.modules))
+"""
+
+
+def measure(modules):
+    probe = PROBE.format(modules=modules, lazy=LAZY_MODULES)
+    output = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True).stdout
+    elapsed, loaded = output.splitlines()
+    return float(elapsed), [module for module in loaded.split(",") if module]
+
+
+def slowest_imports(modules, count=10):
+    # -X importtime prints "self | cumulative | module" per import to stderr
+    probe = "; ".join(f"import {module}" for module in modules)
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", probe], capture_output=True, text=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].rstrip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=float, default=0.25, help="seconds allowed for the startup imports")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    modules = ["main"] if importlib.util.find_spec("win32serviceutil") else AGENT_MODULES
+    results = [measure(modules) for _ in range(args.runs)]
+    elapsed = statistics.median(result[0] for result in results)
+    loaded = results[0][1]
+
+    print(f"startup imports ({', '.join(modules)}): {elapsed * 1000:.1f} ms median of {args.runs}, "
+          f"budget {args.budget * 1000:.0f} ms")
+    for cumulative, module in slowest_imports(modules):
+        print(f"  {cumulative / 1000:8.1f} ms {module}")
+
+    failed = False
+    if loaded:
+        print(f"FAIL: loaded at startup but should be lazy: {', '.join(loaded)}")
+        failed = True
+    if elapsed > args.budget:
+        print("FAIL: startup is over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+import json
+import logging
+import os
+from numbers import Real
+
+from state import state_dir
+
+DEFAULTS = {
+    "collector_url": "http://127.0.0.1:8000/client/status",
+    # seconds between reports, +-10% so a fleet does not report in lockstep
+    "report_interval": 30,
+    # send only what changed since the last status the collector acknowledged,
+    # needs a collector that understands delta messages (see delta.merge_report)
+    "delta_reporting": False,
+    # metrics are always written to metrics.prom, this also serves them on 127.0.0.1
+    "metrics_port": None,
+    # per check overrides, e.g. {"dok": {"enabled": false}, "chrome_version": {"interval": 86400}}
+    "checks": {},
+}
+
+
+def config_path():
+    return os.environ.get("TRACKER_CONFIG") or os.path.join(state_dir(), "tracker.json")
+
+
+log = logging.getLogger(__name__)
+
+
+def positive_number(value):
+    return isinstance(value, Real) and not isinstance(value, bool) and value > 0
+
+
+def optional_port(value):
+    return value is None or (isinstance(value, int) and not isinstance(value, bool) and 0 < value < 65536)
+
+
+# what each key must hold, a bad value is logged and the default is kept
+VALIDATORS = {
+    "collector_url": lambda value: isinstance(value, str) and bool(value),
+    "report_interval": positive_number,
+    "delta_reporting": lambda value: isinstance(value, bool),
+    "metrics_port": optional_port,
+    "checks": lambda value: isinstance(value, dict) and all(isinstance(item, dict) for item in value.values()),
+}
+
+
+def load_config():
+    """DEFAULTS overridden by whatever tracker.json sets.
+
+    A missing file means the defaults, an unreadable file or a bad value is
+    logged and the default used instead, so a typo never stops the service.
+    """
+    config = dict(DEFAULTS)
+    path = config_path()
+    try:
+        # utf-8-sig, Notepad saves with a BOM
+        with open(path, encoding="utf-8-sig") as f:
+            loaded = json.load(f)
+    except FileNotFoundError:
+        return config
+    except (OSError, ValueError) as error:
+        log.error("cannot read %s, using the defaults: %s", path, error)
+        return config
+    if not isinstance(loaded, dict):
+        log.error("%s must hold a json object, using the defaults", path)
+        return config
+    for key, value in loaded.items():
+        if key not in VALIDATORS:
+            log.warning("%s: unknown setting %r ignored", path, key)
+        elif not VALIDATORS[key](value):
+            log.error("%s: bad value %r for %r, using %r", path, value, key, DEFAULTS[key])
+        else:
+            config[key] = value
+    return config
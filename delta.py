@@ -0,0 +1,137 @@
+import hashlib
+import json
+import threading
+
+from state import load_state, save_state
+
+FULL = "full"
+DELTA = "delta"
+HEARTBEAT = "heartbeat"
+
+# how many sent but not yet acknowledged payloads to remember
+MAX_IN_FLIGHT = 16
+
+# fields that change every cycle (the agent's own timings) would turn every
+# heartbeat into a delta, so they stay out of the diff and the hash and ride
+# along as "sidecar" with full snapshots and every SIDECAR_EVERY-th message
+SIDECAR_FIELDS = ("agent_metrics",)
+SIDECAR_EVERY = 10
+
+
+def fingerprint(status):
+    """Content hash of a status dict, the agent and the server must compute it the same way"""
+    return hashlib.sha256(json.dumps(status, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+class ResyncRequired(Exception):
+    """The server cannot apply a delta and needs a full snapshot"""
+
+
+class DeltaReporter:
+    """Turns each status into the smallest message the server can rebuild it from.
+
+    Messages are diffs against the last status the server acknowledged:
+      {"type": "full", "seq", "hash", "state"}
+      {"type": "delta", "seq", "base_seq", "hash", "changed", "removed"}
+      {"type": "heartbeat", "seq", "base_seq", "hash"}
+    any of them may carry {"sidecar": {...}} with the SIDECAR_FIELDS.
+    The server answers {"ack": seq, "hash": hash} or {"resync": true} (or HTTP 409),
+    after which the next message is a full snapshot again.
+    """
+
+    def __init__(self, persist=True):
+        # persist=False keeps the acknowledged status in memory only, e.g. for simulated agents
+        self.persist = persist
+        saved = load_state("delta", {}) if persist else {}
+        self.seq = saved.get("seq", 0)
+        self.acked_seq = saved.get("acked_seq")
+        self.acked = saved.get("acked")
+        self.in_flight = {}
+        self.lock = threading.Lock()
+
+    def build(self, status):
+        # round trip through json so the diff sees the same values the server will
+        status = json.loads(json.dumps(status))
+        sidecar = {key: status.pop(key) for key in SIDECAR_FIELDS if key in status}
+        with self.lock:
+            self.seq += 1
+            message = {"computer_name": status.get("computer_name"), "seq": self.seq, "hash": fingerprint(status)}
+            if self.acked is None:
+                message.update(type=FULL, state=status)
+            else:
+                changed = {key: value for key, value in status.items()
+                           if key not in self.acked or self.acked[key] != value}
+                removed = [key for key in self.acked if key not in status]
+                message["base_seq"] = self.acked_seq
+                if changed or removed:
+                    message.update(type=DELTA, changed=changed, removed=removed)
+                else:
+                    message.update(type=HEARTBEAT)
+            if sidecar and (message["type"] == FULL or self.seq % SIDECAR_EVERY == 0):
+                message["sidecar"] = sidecar
+            self.in_flight[self.seq] = (message["hash"], status)
+            for seq in sorted(self.in_flight)[:-MAX_IN_FLIGHT]:
+                del self.in_flight[seq]
+            return message
+
+    def handle_response(self, status_code, body):
+        """Feed back the server's answer to a message returned by build"""
+        body = body if isinstance(body, dict) else {}
+        with self.lock:
+            if status_code == 409 or body.get("resync"):
+                self._resync()
+                return
+            ack = body.get("ack")
+            # anything but a seq we sent (e.g. a list from a broken collector) is not an ack
+            if not isinstance(ack, int) or isinstance(ack, bool) or ack not in self.in_flight:
+                return
+            sent = self.in_flight[ack]
+            if body.get("hash") != sent[0]:
+                # the server rebuilt something else than what we have
+                self._resync()
+                return
+            self.acked_seq = ack
+            self.acked = sent[1]
+            for seq in [seq for seq in self.in_flight if seq <= self.acked_seq]:
+                del self.in_flight[seq]
+            self._save()
+
+    def _resync(self):
+        self.acked = None
+        self.acked_seq = None
+        self._save()
+
+    def _save(self):
+        if not self.persist:
+            return
+        save_state("delta", {"seq": self.seq, "acked_seq": self.acked_seq, "acked": self.acked})
+
+
+def merge_report(state, message):
+    """Reference server side merge.
+
+    state is what the server holds for the agent ({"seq": .., "status": {..}, "sidecar": {..}}
+    or None), returns the new state or raises ResyncRequired when a full snapshot is needed.
+    The last sidecar received is kept until a new one comes.
+    """
+    if message.get("type") == FULL:
+        status = message["state"]
+    elif message.get("type") in (DELTA, HEARTBEAT):
+        if state is None or message.get("base_seq") != state["seq"]:
+            raise ResyncRequired()
+        status = dict(state["status"])
+        status.update(message.get("changed", {}))
+        for key in message.get("removed", []):
+            status.pop(key, None)
+    else:
+        # an agent without delta mode posts the bare status
+        return {"seq": None, "status": message, "sidecar": {}}
+    if fingerprint(status) != message["hash"]:
+        raise ResyncRequired()
+    sidecar = message.get("sidecar", state.get("sidecar", {}) if state else {})
+    return {"seq": message["seq"], "status": status, "sidecar": sidecar}
+
+
+def ack_response(state):
+    """What the server answers after a successful merge_report"""
+    return {"ack": state["seq"], "hash": fingerprint(state["status"])}
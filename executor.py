@@ -0,0 +1,109 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from metrics import metrics, timed_check
+
+OK = "ok"
+ERROR = "error"
+TIMEOUT = "timeout"
+# the check did not finish this cycle but the payload still holds its last good value
+STALE = "stale"
+# a check it depends on did not succeed, so it was not run
+SKIPPED = "skipped"
+# turned off in tracker.json, its fields are reported as None
+DISABLED = "disabled"
+
+_current = threading.local()
+
+
+def remaining_time():
+    """Seconds left before the check running on this thread is abandoned, None outside a check"""
+    deadline = getattr(_current, "deadline", None)
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def _run_check(name, func, deadline):
+    _current.deadline = deadline
+    try:
+        return timed_check(name, func)
+    finally:
+        _current.deadline = None
+
+
+def _init_worker():
+    # WMI based checks go through COM, which has to be initialized on every thread
+    try:
+        import pythoncom
+    except ImportError:
+        return
+    pythoncom.CoInitialize()
+
+
+class CheckExecutor:
+    """Runs independent checks on a bounded thread pool, each with its own deadline.
+
+    Python threads cannot be killed, so a check that misses its deadline is
+    abandoned: the cycle reports it as timed out and the check is not started
+    again until the old call returns.
+    """
+
+    def __init__(self, max_workers=4):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="check",
+                                       initializer=_init_worker)
+        self.abandoned = {}
+        self.succeeded = set()
+        self.errors = {}
+
+    def run(self, checks):
+        """Run the checks and return {check name: status}"""
+        self._reap_abandoned()
+        statuses = {}
+        deadlines = {}
+        futures = {}
+        start = time.monotonic()
+        for check in checks:
+            if check.name in self.abandoned:
+                statuses[check.name] = self._missed(check.name)
+                continue
+            deadlines[check.name] = start + check.timeout
+            futures[self.pool.submit(_run_check, check.name, check.func, deadlines[check.name])] = check
+
+        pending = set(futures)
+        while pending:
+            now = time.monotonic()
+            for future in [f for f in pending if deadlines[futures[f].name] <= now]:
+                pending.remove(future)
+                future.cancel()
+                self.abandoned[futures[future].name] = future
+                metrics.increment("check_timeouts_total", check=futures[future].name)
+                statuses[futures[future].name] = self._missed(futures[future].name)
+            if not pending:
+                break
+            next_deadline = min(deadlines[futures[f].name] for f in pending)
+            done, pending = wait(pending, timeout=max(0, next_deadline - now), return_when=FIRST_COMPLETED)
+            for future in done:
+                statuses[futures[future].name] = self._finished(futures[future].name, future)
+        return {check.name: statuses[check.name] for check in checks}
+
+    def _finished(self, name, future):
+        error = future.exception()
+        if error is None:
+            self.succeeded.add(name)
+            self.errors.pop(name, None)
+            return OK
+        self.errors[name] = f"{type(error).__name__}: {error}"
+        return ERROR
+
+    def _missed(self, name):
+        return STALE if name in self.succeeded else TIMEOUT
+
+    def _reap_abandoned(self):
+        for name, future in list(self.abandoned.items()):
+            if future.done():
+                del self.abandoned[name]
+                if not future.cancelled():
+                    self._finished(name, future)
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -2,37 +2,92 @@ import sys
 import win32serviceutil  # ServiceFramework and commandline helper
 import win32service  # Events
 import servicemanager  # Simple setup and logging
-import requests
-from time import sleep
+import logging
+import os
+import threading
 
-from systen_checks import password_policy, dok, chrome_version, system_version, anti_virus, windows_firewall_is_on, \
-    login_events, get_result
+from config import load_config
+from executor import CheckExecutor
+from metrics import metrics, profile_cycle, request_profile, serve_metrics
+from registry import LazyTarget, disabled_checks, load_checks
+from scheduler import Scheduler
+from state import state_dir
+
+log = logging.getLogger(__name__)
+
+# the check modules are imported the first time a check runs (see registry.py), so
+# the service reports RUNNING without waiting for windows_tools and friends
 
 
 class MyService:
     """Silly little application stub"""
+    def __init__(self):
+        self.running = False
+        self.wakeup = threading.Event()
+        self.reporter = None
+        self.scheduler = None
+
     def stop(self):
 
         """Stop the service"""
         self.running = False
+        self.wakeup.set()
+
+    def on_response(self, status_code, body):
+        """Answer from the collector, which may ask for a full snapshot or for fresh checks"""
+        if self.reporter is not None:
+            self.reporter.handle_response(status_code, body)
+        refresh = body.get("refresh") if isinstance(body, dict) else None
+        # {"refresh": true} reruns every check, {"refresh": ["dok", ...]} only those
+        if refresh is True:
+            self.scheduler.refresh()
+            self.wakeup.set()
+        elif isinstance(refresh, list) and all(isinstance(name, str) for name in refresh):
+            self.scheduler.refresh(refresh)
+            self.wakeup.set()
+        elif refresh not in (None, False):
+            log.warning("ignored refresh request %r, expected true or a list of check names", refresh)
+        if isinstance(body, dict) and body.get("profile"):
+            request_profile()
 
     def run(self):
         """Main service loop. This is where work is done!"""
-        #now = datetime.now()
-        #now.hour == 0 and now.minute == 0 and now.second == 0
+        # requests is slow to import, so the transport is loaded after the service is up
+        from delta import DeltaReporter
+        from transport import StatusTransport
+
         self.running = True
+        # a service has no console, config problems and the like go to agent.log
+        logging.basicConfig(filename=os.path.join(state_dir(), "agent.log"), level=logging.INFO,
+                            format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+        config = load_config()
+        checks = load_checks(config)
+        executor = CheckExecutor(max_workers=max(1, len(checks)))
+        self.scheduler = Scheduler(checks, executor, LazyTarget("systen_checks:get_result"),
+                                   report_interval=config["report_interval"], disabled=disabled_checks(config))
+        self.reporter = DeltaReporter() if config["delta_reporting"] else None
+        transport = StatusTransport(config["collector_url"],
+                                    encode=self.reporter.build if self.reporter else None,
+                                    on_response=self.on_response)
+        transport.start()
+        if config["metrics_port"]:
+            serve_metrics(config["metrics_port"])
+        metrics_path = os.path.join(state_dir(), "metrics.prom")
         while self.running == True:
-            system_version()
-            anti_virus()
-            windows_firewall_is_on()
-            password_policy()
-            dok()
-            chrome_version()
-            login_events()
-            result = get_result()
-            requests.post(f"http://127.0.0.1:8000/client/status", json=result)
-            sleep(30)
-            self.running = False
+            # a profile, when requested, goes to cycle.prof (see metrics.request_profile)
+            with profile_cycle(os.path.join(state_dir(), "cycle.prof")), metrics.timer("cycle_seconds"):
+                self.scheduler.run_due()
+                # checks run whenever they are due, reports only once per report_interval
+                if self.scheduler.report_due():
+                    report = self.scheduler.report()
+                    report["agent_metrics"] = metrics.summary()
+                    transport.submit(report)
+            metrics.write(metrics_path)
+            # wake up for the next due check or the next report, whichever comes first
+            self.wakeup.wait(self.scheduler.seconds_until_next())
+            self.wakeup.clear()
+        executor.shutdown()
+        transport.stop()
 
 class MyServiceFramework(win32serviceutil.ServiceFramework):
 
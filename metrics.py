@@ -0,0 +1,210 @@
+import cProfile
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+        self.last = 0
+
+    def observe(self, value):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        self.last = value
+
+
+class Metrics:
+    """Counters and histograms of where the agent spends its time.
+
+    Label values go into the key, e.g. observe("check_wall_seconds", 0.2, check="dok").
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def increment(self, name, amount=1, **labels):
+        key = _key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, buckets=TIME_BUCKETS, **labels):
+        key = _key(name, labels)
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(buckets)
+            self.histograms[key].observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def render(self):
+        """Prometheus text format"""
+        lines = []
+        with self.lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f"tracker_{name}{_labels(labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                    cumulative += count
+                    lines.append(f"tracker_{name}_bucket{_labels(labels + (('le', bound),))} {cumulative}")
+                lines.append(f"tracker_{name}_sum{_labels(labels)} {histogram.sum:.6f}")
+                lines.append(f"tracker_{name}_count{_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Small dict sent with every report so slow machines stand out in the fleet"""
+        with self.lock:
+            checks = {dict(labels)["check"]: [round(histogram.last, 3), round(histogram.max, 3)]
+                      for (name, labels), histogram in self.histograms.items() if name == "check_wall_seconds"}
+            shell = self.histograms.get(("shell_command_seconds", ()))
+            upload = self.histograms.get(("upload_seconds", ()))
+            cycle = self.histograms.get(("cycle_seconds", ()))
+            report = self.histograms.get(("report_bytes", ()))
+            return {
+                # [last, max] wall seconds per check
+                "check_seconds": checks,
+                "cycle_seconds": round(cycle.last, 3) if cycle else None,
+                "shell_spawns": self.counters.get(("shell_spawns_total", ()), 0),
+                "shell_commands": shell.count if shell else 0,
+                "shell_seconds": round(shell.sum, 3) if shell else 0,
+                "report_bytes": report.last if report else None,
+                "upload_seconds": round(upload.last, 3) if upload else None,
+                "upload_errors": sum(value for (name, _), value in self.counters.items()
+                                     if name == "upload_errors_total"),
+                "check_errors": sum(value for (name, _), value in self.counters.items()
+                                    if name == "check_errors_total"),
+            }
+
+    def write(self, path):
+        with open(path + ".tmp", "w") as f:
+            f.write(self.render())
+        os.replace(path + ".tmp", path)
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+
+metrics = Metrics()
+
+
+def timed_check(name, func):
+    """Run a check, recording its wall and cpu time, and profile it when a profile is being taken"""
+    wall = time.perf_counter()
+    cpu = time.thread_time()
+    try:
+        if _profile.active:
+            return _profile.run(func)
+        return func()
+    except Exception:
+        metrics.increment("check_errors_total", check=name)
+        raise
+    finally:
+        metrics.observe("check_wall_seconds", time.perf_counter() - wall, check=name)
+        metrics.observe("check_cpu_seconds", time.thread_time() - cpu, check=name)
+
+
+class _CycleProfile:
+    """cProfile stats of one whole cycle, checks run on pool threads so each call is profiled on its own"""
+
+    def __init__(self):
+        self.requested = bool(os.environ.get("TRACKER_PROFILE_CYCLE"))
+        self.active = False
+        self.profiles = []
+        self.lock = threading.Lock()
+
+    def run(self, func):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # python 3.12+ allows only one profiler at a time
+            return func()
+        try:
+            return func()
+        finally:
+            profiler.disable()
+            with self.lock:
+                self.profiles.append(profiler)
+
+
+_profile = _CycleProfile()
+
+
+def request_profile():
+    """Profile the next cycle, also done for the first cycle when TRACKER_PROFILE_CYCLE is set"""
+    _profile.requested = True
+
+
+@contextmanager
+def profile_cycle(path):
+    """Wrap one cycle; when a profile was requested its stats are dumped to path"""
+    if not _profile.requested:
+        yield
+        return
+    _profile.requested = False
+    _profile.profiles = []
+    _profile.active = True
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _profile.active = False
+        stats = pstats.Stats(profiler)
+        for check_profiler in _profile.profiles:
+            stats.add(check_profiler)
+        stats.dump_stats(path)
+
+
+def serve_metrics(port):
+    """Serve the metrics on http://127.0.0.1:port/ from a background thread"""
+    # http.server is only imported when the endpoint is turned on, it slows down startup
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
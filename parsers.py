@@ -0,0 +1,70 @@
+import json
+from collections import namedtuple
+
+# one parser per check, each takes the raw stdout bytes of the check's command.
+# The commands print json (ConvertTo-Json) in UTF-8, so nothing depends on the
+# console code page or on the language of the text Windows prints.
+
+PasswordPolicy = namedtuple("PasswordPolicy", ["max_pass_age", "min_pass_len"])
+FailedLogin = namedtuple("FailedLogin", ["record_id", "time", "day"])
+
+
+class ParseError(ValueError):
+    """The command printed something other than what its parser expects"""
+
+
+def decode_json(output):
+    """The json value printed by a command, None when it printed nothing"""
+    try:
+        text = output.decode("utf-8-sig").strip()
+        return json.loads(text) if text else None
+    except ValueError as error:
+        raise ParseError(f"not json: {output[:80]!r}") from error
+
+
+def records(output):
+    # ConvertTo-Json prints a lone object instead of a one item array
+    value = decode_json(output)
+    if value is None:
+        return []
+    if isinstance(value, dict):
+        return [value]
+    if isinstance(value, list):
+        return value
+    raise ParseError(f"expected an object or a list, got {type(value).__name__}")
+
+
+def parse_usb_devices(output):
+    """Number of USB storage devices, from [{"FriendlyName": ...}, ...]"""
+    return sum(1 for device in records(output) if isinstance(device, dict) and device.get("FriendlyName"))
+
+
+def parse_password_policy(output):
+    """From {"MaximumPasswordAge": days, "MinimumPasswordLength": n}, -1 days means passwords never expire"""
+    policy = decode_json(output)
+    if not isinstance(policy, dict):
+        raise ParseError("no password policy in the output")
+    try:
+        return PasswordPolicy(int(policy["MaximumPasswordAge"]), int(policy["MinimumPasswordLength"]))
+    except (KeyError, TypeError, ValueError) as error:
+        raise ParseError(f"bad password policy {policy!r}") from error
+
+
+def parse_chrome_version(output):
+    """From {"DisplayVersion": "..."}, None when Chrome is not installed"""
+    found = records(output)
+    if not found:
+        return None
+    version = found[0].get("DisplayVersion") if isinstance(found[0], dict) else None
+    return str(version) if version else None
+
+
+def parse_failed_logins(output):
+    """From [{"id": record id, "utc": ISO time, "day": "yyyy-MM-dd"}, ...]"""
+    found = []
+    for event in records(output):
+        try:
+            found.append(FailedLogin(int(event["id"]), str(event["utc"]), str(event["day"])))
+        except (KeyError, TypeError, ValueError) as error:
+            raise ParseError(f"bad failed login event {event!r}") from error
+    return found
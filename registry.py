@@ -0,0 +1,110 @@
+import importlib
+import logging
+import threading
+from numbers import Real
+from collections import namedtuple
+
+from scheduler import ScheduledCheck
+
+# target is "module:function", the module is only imported the first time the check runs
+CheckDefinition = namedtuple("CheckDefinition",
+                             ["name", "target", "fields", "timeout", "interval", "ttl", "depends"])
+
+CHECKS = []
+
+log = logging.getLogger(__name__)
+
+
+def register(name, target, fields, timeout, interval, ttl, depends=()):
+    CHECKS.append(CheckDefinition(name, target, list(fields), timeout, interval, ttl, tuple(depends)))
+
+
+# values that rarely change are checked rarely, the ttl says how long a value is still reported as fresh
+register("system_version", "systen_checks:system_version", ["system_version"],
+         timeout=5, interval=6 * 60 * 60, ttl=12 * 60 * 60)
+register("anti_virus", "systen_checks:anti_virus",
+         ["antivirus_installed", "antivirus_enabled", "antivirus_up_to_date"],
+         timeout=30, interval=10 * 60, ttl=20 * 60)
+register("windows_firewall_is_on", "systen_checks:windows_firewall_is_on", ["windows_firewall_is_active"],
+         timeout=30, interval=30, ttl=90)
+register("password_policy", "systen_checks:password_policy", ["max_pass_age", "min_pass_len"],
+         timeout=20, interval=60 * 60, ttl=2 * 60 * 60)
+register("dok", "systen_checks:dok", ["number_of_connected_doks"],
+         timeout=20, interval=30, ttl=90)
+register("chrome_version", "systen_checks:chrome_version", ["chrome_version"],
+         timeout=20, interval=60 * 60, ttl=2 * 60 * 60)
+register("login_events", "systen_checks:login_events", ["failed_login_event"],
+         timeout=60, interval=60, ttl=3 * 60)
+
+
+class LazyTarget:
+    """Callable standing in for "module:function" until it is first called"""
+
+    def __init__(self, target):
+        self.target = target
+        self.func = None
+        self.lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        if self.func is None:
+            with self.lock:
+                if self.func is None:
+                    module, name = self.target.split(":")
+                    self.func = getattr(importlib.import_module(module), name)
+        return self.func(*args, **kwargs)
+
+
+def _valid_override(key, value):
+    if key == "enabled":
+        return isinstance(value, bool)
+    if key in ("timeout", "interval", "ttl"):
+        return isinstance(value, Real) and not isinstance(value, bool) and value > 0
+    return False
+
+
+def check_overrides(overrides):
+    """The per check settings from config that make sense, the rest is logged and dropped"""
+    known = {definition.name for definition in CHECKS}
+    valid = {}
+    for name, settings in overrides.items():
+        if name not in known:
+            log.warning("unknown check %r in config ignored, known checks: %s", name, ", ".join(sorted(known)))
+            continue
+        valid[name] = {}
+        for key, value in settings.items():
+            if _valid_override(key, value):
+                valid[name][key] = value
+            else:
+                log.error("bad setting %r = %r for check %s ignored", key, value, name)
+    return valid
+
+
+def disabled_checks(config):
+    """The definitions of the checks tracker.json turns off"""
+    overrides = config.get("checks", {})
+    return [definition for definition in CHECKS
+            if isinstance(overrides.get(definition.name), dict) and overrides[definition.name].get("enabled") is False]
+
+
+def load_checks(config):
+    """The enabled checks as ScheduledCheck, with the timings from config applied"""
+    overrides = check_overrides(config.get("checks", {}))
+    checks = []
+    for definition in CHECKS:
+        settings = overrides.get(definition.name, {})
+        if not settings.get("enabled", True):
+            continue
+        checks.append(ScheduledCheck(
+            name=definition.name,
+            func=LazyTarget(definition.target),
+            timeout=settings.get("timeout", definition.timeout),
+            interval=settings.get("interval", definition.interval),
+            ttl=settings.get("ttl", definition.ttl),
+            fields=definition.fields,
+            depends=definition.depends))
+    enabled = {check.name for check in checks}
+    for check in checks:
+        missing = [name for name in check.depends if name not in enabled]
+        if missing:
+            raise ValueError(f"check {check.name} depends on disabled or unknown checks: {', '.join(missing)}")
+    return checks
@@ -0,0 +1,163 @@
+import random
+import threading
+import time
+from collections import namedtuple
+
+from executor import DISABLED, OK, SKIPPED, STALE
+
+# interval: seconds between runs, ttl: seconds the result is reported as fresh,
+# fields: the keys of client_status the check fills in,
+# depends: checks that have to succeed before this one runs
+ScheduledCheck = namedtuple("ScheduledCheck", ["name", "func", "timeout", "interval", "ttl", "fields", "depends"],
+                            defaults=[()])
+
+
+class ResultCache:
+    """Last good values of every check, with when they were taken and when they go stale"""
+
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def store(self, name, values, ttl, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.entries[name] = {"values": values, "status": OK, "updated_at": now, "expires_at": now + ttl}
+
+    def mark(self, name, status):
+        """Record a failed run, the last good values are kept"""
+        with self.lock:
+            entry = self.entries.setdefault(name, {"values": {}, "updated_at": None, "expires_at": None})
+            entry["status"] = status
+
+    def get(self, name, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is None:
+                return None
+            entry = dict(entry)
+        if entry["status"] == OK and entry["expires_at"] <= now:
+            entry["status"] = STALE
+        return entry
+
+
+class Scheduler:
+    """Runs each check on its own interval and builds reports from the cached results.
+
+    Intervals get +-jitter so agents started together drift apart instead of
+    hitting WMI and the collector at the same second. Reports have their own
+    deadline: checks run whenever they are due, a report goes out once every
+    report_interval (report_due says when).
+    """
+
+    def __init__(self, checks, executor, source, cache=None, jitter=0.1, report_interval=30, clock=time.monotonic,
+                 disabled=()):
+        self.checks = list(checks)
+        # checks turned off in config (anything with name and fields), never run and reported as disabled
+        self.disabled = list(disabled)
+        self.executor = executor
+        self.source = source
+        self.cache = cache or ResultCache()
+        self.jitter = jitter
+        self.report_interval = report_interval
+        self.clock = clock
+        now = clock()
+        self.next_run = {check.name: now for check in self.checks}
+        self.next_report = now
+        self.lock = threading.Lock()
+
+    def refresh(self, names=None):
+        """Run the given checks (all when None) on the next tick, whatever their interval"""
+        now = self.clock()
+        names = None if names is None else set(names)
+        with self.lock:
+            for check in self.checks:
+                if names is None or check.name in names:
+                    self.next_run[check.name] = now
+
+    def run_due(self):
+        start = self.clock()
+        with self.lock:
+            due = [check for check in self.checks if self.next_run[check.name] <= start]
+        statuses = {}
+        for wave in self._waves(due):
+            ready = []
+            for check in wave:
+                if all(self._succeeded(name, statuses) for name in check.depends):
+                    ready.append(check)
+                else:
+                    statuses[check.name] = SKIPPED
+            statuses.update(self.executor.run(ready))
+        values = self.source()
+        now = self.clock()
+        for check in due:
+            if statuses[check.name] == OK:
+                self.cache.store(check.name, {field: values.get(field) for field in check.fields}, check.ttl, now)
+            else:
+                self.cache.mark(check.name, statuses[check.name])
+            with self.lock:
+                # counted from the start of the cycle so slow cycles do not push the schedule back
+                self.next_run[check.name] = start + self._jittered(check.interval)
+        return statuses
+
+    def _waves(self, due):
+        # a due check runs after the due checks it depends on, the rest run together
+        waves = []
+        waiting = list(due)
+        while waiting:
+            names = {check.name for check in waiting}
+            wave = [check for check in waiting if not names.intersection(check.depends)]
+            if not wave:
+                raise ValueError(f"dependency cycle between checks: {', '.join(sorted(names))}")
+            waves.append(wave)
+            waiting = [check for check in waiting if check not in wave]
+        return waves
+
+    def _succeeded(self, name, statuses):
+        if name in statuses:
+            return statuses[name] == OK
+        entry = self.cache.get(name, self.clock())
+        return entry is not None and entry["status"] == OK
+
+    def report(self):
+        """The status payload, built from the cache rather than from whatever the checks left behind.
+
+        Fields of a check with no good result yet are None, even when an abandoned
+        call already wrote part of them, and so are the fields of a disabled check
+        rather than the defaults that would read as a real value.
+        """
+        report = dict(self.source())
+        now = self.clock()
+        check_status = {}
+        for check in self.disabled:
+            for field in check.fields:
+                report[field] = None
+            check_status[check.name] = DISABLED
+        for check in self.checks:
+            entry = self.cache.get(check.name, now)
+            values = entry["values"] if entry else {}
+            for field in check.fields:
+                report[field] = values.get(field)
+            if entry is not None:
+                check_status[check.name] = entry["status"]
+        report["check_status"] = check_status
+        report["check_errors"] = dict(self.executor.errors)
+        return report
+
+    def report_due(self):
+        """True when a report should go out now, the next one is then one report_interval away"""
+        now = self.clock()
+        with self.lock:
+            if now < self.next_report:
+                return False
+            self.next_report = now + self._jittered(self.report_interval)
+            return True
+
+    def seconds_until_next(self):
+        """Time until the next check is due or the next report, whichever comes first"""
+        with self.lock:
+            return max(0, min(self.next_report, *self.next_run.values()) - self.clock())
+
+    def _jittered(self, seconds):
+        return seconds * random.uniform(1 - self.jitter, 1 + self.jitter)
@@ -0,0 +1,217 @@
+import queue
+import subprocess
+import threading
+import time
+import uuid
+
+from metrics import metrics
+
+
+class PowerShellDialect:
+    """Runs commands in a long lived powershell.exe reading from stdin"""
+
+    def __init__(self, executable="powershell.exe"):
+        self.executable = executable
+
+    def argv(self):
+        return [self.executable, '-noprofile', '-noninteractive', '-executionpolicy', 'bypass', '-command', '-']
+
+    def setup(self):
+        # print UTF-8 whatever the console code page is, the parsers decode UTF-8
+        return "[Console]::OutputEncoding = [Text.Encoding]::UTF8; $OutputEncoding = [Text.Encoding]::UTF8\n"
+
+    def frame(self, command, marker):
+        # every line is run as its own pipeline, so $? still belongs to the command
+        # when the status line runs. The marker is written to both streams so the
+        # reader knows where this command's output ends.
+        return (
+            "$global:LASTEXITCODE = 0\n"
+            f"{command}\n"
+            "$__rc = if ($?) { 0 } else { 1 }; if ($global:LASTEXITCODE) { $__rc = $global:LASTEXITCODE }; "
+            f"[Console]::Out.WriteLine(\"{marker}:$__rc\"); [Console]::Out.Flush(); "
+            f"[Console]::Error.WriteLine('{marker}'); [Console]::Error.Flush()\n"
+        )
+
+
+class BashDialect:
+    """Stand-in for PowerShell so the pool can be exercised on Linux"""
+
+    def __init__(self, executable="bash"):
+        self.executable = executable
+
+    def argv(self):
+        return [self.executable, '--noprofile', '--norc', '-s']
+
+    def setup(self):
+        return ""
+
+    def frame(self, command, marker):
+        return f"{command}\nprintf '{marker}:%s\\n' \"$?\"\nprintf '{marker}\\n' >&2\n"
+
+
+def _pump(stream, lines):
+    for line in iter(stream.readline, b''):
+        lines.put(line)
+    lines.put(None)
+    stream.close()
+
+
+class ShellSession:
+    """One warm shell process. Not thread safe, the pool hands it to one caller at a time"""
+
+    def __init__(self, dialect):
+        self.dialect = dialect
+        metrics.increment("shell_spawns_total")
+        self.process = subprocess.Popen(
+            dialect.argv(),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0))
+        self.stdout_lines = queue.Queue()
+        self.stderr_lines = queue.Queue()
+        for stream, lines in ((self.process.stdout, self.stdout_lines), (self.process.stderr, self.stderr_lines)):
+            threading.Thread(target=_pump, args=(stream, lines), daemon=True).start()
+        setup = self.dialect.setup()
+        if setup:
+            self.process.stdin.write(setup.encode())
+            self.process.stdin.flush()
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def run(self, command, timeout=None):
+        with metrics.timer("shell_command_seconds"):
+            return self._run(command, timeout)
+
+    def _run(self, command, timeout):
+        marker = f"__TRACKER_END_{uuid.uuid4().hex}__"
+        try:
+            self.process.stdin.write(self.dialect.frame(command, marker).encode())
+            self.process.stdin.flush()
+        except OSError:
+            self.close()
+            return subprocess.CompletedProcess(command, self.process.poll(), b'', b'')
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        stdout, returncode = self._read_until(self.stdout_lines, marker, deadline, command, timeout)
+        if returncode is None:
+            # the shell died half way through the command, or the command swallowed
+            # the frame (e.g. it read stdin), either way this session is done
+            self.close()
+            return subprocess.CompletedProcess(command, self.process.poll(), stdout, self._drain(self.stderr_lines))
+        stderr, _ = self._read_until(self.stderr_lines, marker, deadline, command, timeout)
+        return subprocess.CompletedProcess(command, returncode, stdout, stderr)
+
+    def _read_until(self, lines, marker, deadline, command, timeout):
+        """Output up to the marker and the status after it, None as status when there is no usable frame"""
+        marker = marker.encode()
+        output = []
+        while True:
+            wait = None if deadline is None else deadline - time.monotonic()
+            if wait is not None and wait <= 0:
+                self.close()
+                metrics.increment("shell_timeouts_total")
+                raise subprocess.TimeoutExpired(command, timeout, output=b''.join(output))
+            try:
+                line = lines.get(timeout=wait)
+            except queue.Empty:
+                continue
+            if line is None:
+                return b''.join(output), None
+            index = line.find(marker)
+            if index == -1:
+                output.append(line)
+                continue
+            output.append(line[:index])
+            status = line[index + len(marker):].strip()
+            if not status:
+                return b''.join(output), 0
+            try:
+                return b''.join(output), int(status[1:]) if status.startswith(b':') else None
+            except ValueError:
+                return b''.join(output), None
+
+    def _drain(self, lines):
+        output = []
+        while True:
+            try:
+                line = lines.get(timeout=0.1)
+            except queue.Empty:
+                break
+            if line is None:
+                break
+            output.append(line)
+        return b''.join(output)
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.kill()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                pass
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+
+
+class ShellPool:
+    """Keeps up to `size` warm shells and hands them out one command at a time.
+
+    A shell that exited is replaced before use and a shell that hangs past the
+    timeout is killed, so the next command gets a fresh one.
+    """
+
+    def __init__(self, dialect=None, size=2, timeout=120):
+        self.dialect = dialect or PowerShellDialect()
+        self.timeout = timeout
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(size)
+        self.lock = threading.Lock()
+        self.sessions = []
+        self.closed = False
+
+    def run(self, command, timeout=None):
+        if timeout is None:
+            timeout = self.timeout
+        with self.slots:
+            session = self._checkout()
+            try:
+                return session.run(command, timeout=timeout)
+            finally:
+                self._checkin(session)
+
+    def _checkout(self):
+        while True:
+            try:
+                session = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            if session.is_alive():
+                return session
+            self._forget(session)
+        session = ShellSession(self.dialect)
+        with self.lock:
+            self.sessions.append(session)
+        return session
+
+    def _checkin(self, session):
+        if session.is_alive() and not self.closed:
+            self.idle.put(session)
+        else:
+            session.close()
+            self._forget(session)
+
+    def _forget(self, session):
+        with self.lock:
+            if session in self.sessions:
+                self.sessions.remove(session)
+
+    def close(self):
+        self.closed = True
+        with self.lock:
+            sessions, self.sessions = self.sessions, []
+        for session in sessions:
+            session.close()
@@ -0,0 +1,32 @@
+import json
+import os
+import tempfile
+import threading
+
+_lock = threading.Lock()
+
+
+def state_dir():
+    """Folder for everything the agent keeps between restarts"""
+    path = os.environ.get("TRACKER_STATE_DIR") or os.path.join(
+        os.environ.get("PROGRAMDATA", tempfile.gettempdir()), "Tracker")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def load_state(name, default=None):
+    path = os.path.join(state_dir(), f"{name}.json")
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def save_state(name, value):
+    # write to a temp file and rename so a crash never leaves half a file behind
+    path = os.path.join(state_dir(), f"{name}.json")
+    with _lock:
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(value, f)
+        os.replace(path + ".tmp", path)
@@ -1,17 +1,10 @@
 import socket
-import re
-import datetime
-from datetime import datetime
-import windows_tools.antivirus
-import windows_tools.windows_firewall
-import windows_tools.powershell
+from datetime import date, timedelta
 import platform
-import eventlet
-eventlet.monkey_patch()
 
-import requests
-
-from utils import run_shell_command, make_list_from_data
+from parsers import parse_chrome_version, parse_failed_logins, parse_password_policy, parse_usb_devices
+from state import load_state, save_state
+from utils import run_shell_command
 
 
 
@@ -26,7 +19,9 @@ client_status = {"computer_name": socket.gethostname(),
                  "min_pass_len": None,
                  "number_of_connected_doks": None,
                  "chrome_version": None,
-                 "failed_login_event": None}
+                 "failed_login_event": None,
+                 "check_status": {},
+                 "check_errors": {}}
 
 
 def system_version():
@@ -34,6 +29,8 @@ def system_version():
 
 
 def anti_virus():
+    # windows_tools is slow to import, so it is loaded the first time a check needs it
+    import windows_tools.antivirus
     result = windows_tools.antivirus.get_installed_antivirus_software()
     enable_status = []
     is_up_to_date_status = []
@@ -62,25 +59,21 @@ def anti_virus():
 
 def dok():
     output = run_shell_command(
-        "Get-ItemProperty -PATH 'HKLM:\\SYSTEM\\CurrentControlSet\\Enum\\USBSTOR\\*\\*' | Select FriendlyName")
-    result = make_list_from_data(output.stdout.decode("oem"))
-    # 6 is the number of the extra data in the list
-    dok_number = len(result) - 6
-    client_status["number_of_connected_doks"] = dok_number
+        "ConvertTo-Json -Compress -InputObject @(Get-ItemProperty "
+        "-Path 'HKLM:\\SYSTEM\\CurrentControlSet\\Enum\\USBSTOR\\*\\*' -ErrorAction SilentlyContinue "
+        "| Select-Object FriendlyName)")
+    client_status["number_of_connected_doks"] = parse_usb_devices(output.stdout)
 
 
 def chrome_version():
     output = run_shell_command(
-        "reg query 'HKLM\\SOFTWARE\\Wow6432Node\\Microsoft\\Windows\\CurrentVersion\\Uninstall\\Google Chrome'")
-    lines = output.stdout.decode("oem").splitlines()
-    for line in lines:
-        if "DisplayVersion" in line:
-            version_line = line
-    version = (version_line.split("    "))[3]
-    client_status["chrome_version"] = version
+        "Get-ItemProperty -Path 'HKLM:\\SOFTWARE\\Wow6432Node\\Microsoft\\Windows\\CurrentVersion\\Uninstall\\Google Chrome' "
+        "-ErrorAction SilentlyContinue | Select-Object DisplayVersion | ConvertTo-Json -Compress")
+    client_status["chrome_version"] = parse_chrome_version(output.stdout)
 
 
 def windows_firewall_is_on():
+    import windows_tools.windows_firewall
     firewall_status = windows_tools.windows_firewall.is_firewall_active()
     if not firewall_status:
         run_shell_command("Netsh advfirewall set allprofile state on")
@@ -89,43 +82,65 @@ def windows_firewall_is_on():
 
 
 def password_policy():
-    max_pass_age = ""
-    min_pass_len = ""
-    output = run_shell_command("net accounts")
-    lines = output.stdout.decode("oem").splitlines()
-    for line in lines:
-        if "Maximum password age" in line:
-            for char in line:
-                if (char >= '0' and char <= '9'):
-                    max_pass_age = max_pass_age + char
-
-        if "Minimum password length" in line:
-            for char in line:
-                if (char >= '0' and char <= '9'):
-                    min_pass_len = min_pass_len + char
-    client_status["max_pass_age"] = int(max_pass_age)
-    client_status["min_pass_len"] = int(min_pass_len)
+    # secedit writes the policy under fixed key names, unlike net accounts whose labels are translated.
+    # /mergedpolicy exports the policy in effect, on a domain joined machine the plain export is
+    # only the local policy the domain GPO overrides
+    output = run_shell_command(
+        "$cfg = Join-Path $env:TEMP 'tracker-secpol.inf'; "
+        "secedit /export /mergedpolicy /cfg $cfg /areas SECURITYPOLICY /quiet | Out-Null; $policy = @{}; "
+        "Get-Content $cfg | ForEach-Object { if ($_ -match '^(MaximumPasswordAge|MinimumPasswordLength)\\s*=\\s*(-?\\d+)') "
+        "{ $policy[$Matches[1]] = [int]$Matches[2] } }; "
+        "Remove-Item $cfg -ErrorAction SilentlyContinue; $policy | ConvertTo-Json -Compress")
+    policy = parse_password_policy(output.stdout)
+    client_status["max_pass_age"] = policy.max_pass_age
+    client_status["min_pass_len"] = policy.min_pass_len
+
+
+# failed logins are counted per day for this many days back
+FAILED_LOGIN_WINDOW_DAYS = 30
+
+
+def failed_login_command(cursor):
+    # only ask the event log for what we have not counted yet. The time condition
+    # keeps the cursor working after the Security log is cleared and record ids restart
+    if cursor:
+        condition = f"(EventRecordID>{cursor['record_id']} or TimeCreated[@SystemTime>'{cursor['time']}'])"
+    else:
+        condition = f"TimeCreated[timediff(@SystemTime) <= {FAILED_LOGIN_WINDOW_DAYS * 24 * 60 * 60 * 1000}]"
+    return (
+        "ConvertTo-Json -Compress -InputObject @(Get-WinEvent -LogName Security -ErrorAction SilentlyContinue "
+        f"-FilterXPath \"*[System[EventID=4625 and {condition}]]\" | "
+        "ForEach-Object { @{ id = $_.RecordId; utc = $_.TimeCreated.ToUniversalTime().ToString('o'); "
+        "day = $_.TimeCreated.ToString('yyyy-MM-dd', [Globalization.CultureInfo]::InvariantCulture) } })")
+
+
+def count_failed_logins(events, cursor=None):
+    """One pass over the events, returns the new cursor and the count per day"""
+    counts = {}
+    for event in events:
+        counts[event.day] = counts.get(event.day, 0) + 1
+        # the utc times all have the same format, so they compare as strings
+        if cursor is None or (event.time, event.record_id) > (cursor["time"], cursor["record_id"]):
+            cursor = {"record_id": event.record_id, "time": event.time}
+    return cursor, counts
+
+
+def merge_failed_logins(days, counts, today):
+    first_day = str(today - timedelta(days=FAILED_LOGIN_WINDOW_DAYS - 1))
+    merged = {day: count for day, count in days.items() if day >= first_day}
+    for day, count in counts.items():
+        if day >= first_day:
+            merged[day] = merged.get(day, 0) + count
+    return dict(sorted(merged.items()))
 
 
 def login_events():
-    output = run_shell_command(
-        "get-eventlog security  | where-object {$_.EventID -eq  '4625'} | select TimeGenerated |fl")
-    result = make_list_from_data(output.stdout.decode("oem"))
-    filtered_list = []
-    for i in result:
-        match1 = re.search(r'\d{1}/\d{2}/\d{4}', i)
-        match2 = re.search(r'\d{2}/\d{2}/\d{4}', i)
-        match3 = re.search(r'\d{2}/\d{1}/\d{4}', i)
-        if match1 != None:
-            res1 = datetime.strptime(match1.group(), '%m/%d/%Y').date()
-            filtered_list.append(str(res1))
-        if match2 != None:
-            res2 = datetime.strptime(match2.group(), '%m/%d/%Y').date()
-            filtered_list.append(str(res2))
-        if match3 != None:
-            res3 = datetime.strptime(match3.group(), '%m/%d/%Y').date()
-            filtered_list.append(str(res3))
-    client_status["failed_login_event"] = filtered_list
+    saved = load_state("failed_logins", {"cursor": None, "days": {}})
+    output = run_shell_command(failed_login_command(saved["cursor"]))
+    cursor, counts = count_failed_logins(parse_failed_logins(output.stdout), saved["cursor"])
+    days = merge_failed_logins(saved["days"], counts, date.today())
+    save_state("failed_logins", {"cursor": cursor, "days": days})
+    client_status["failed_login_event"] = days
 
 def get_result():
     return client_status
@@ -141,6 +156,7 @@ if __name__ == '__main__':
     login_events()
     result = get_result()
     print(result)
+    import requests
     requests.post(f"http://193.106.55.136:80/client/status", json=result )
 
 
@@ -0,0 +1,78 @@
+"""Stand-in collector for transport tests, with injectable latency, failures and hangs"""
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bench.collector import Collector
+
+
+class StandinCollector:
+    """Serves /client/status through the reference Collector.
+
+    Each request first takes the next action from `script`: an HTTP status to
+    answer with, "hang" to block until release() is called, or None to serve
+    normally. latency seconds are added to every request.
+    """
+
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.script = []
+        self.collector = Collector()
+        self.received = []
+        self.encodings = []
+        self.released = threading.Event()
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/client/status"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def release(self):
+        self.released.set()
+
+    def close(self):
+        self.release()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _next_action(self):
+        with self.lock:
+            return self.script.pop(0) if self.script else None
+
+    def _handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                action = standin._next_action()
+                if action == "hang":
+                    standin.released.wait()
+                if standin.latency:
+                    standin.released.wait(standin.latency)
+                if isinstance(action, int):
+                    self._answer(action, {"error": "injected"})
+                    return
+                encoding = self.headers.get("Content-Encoding")
+                message = json.loads(gzip.decompress(body) if encoding == "gzip" else body)
+                status, answer = standin.collector.handle_status(body, encoding)
+                with standin.lock:
+                    standin.encodings.append(encoding)
+                    standin.received.append(message)
+                self._answer(status, answer)
+
+            def _answer(self, status, answer):
+                body = json.dumps(answer).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
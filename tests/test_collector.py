@@ -0,0 +1,60 @@
+import asyncio
+import gzip
+import json
+
+import pytest
+
+from bench.collector import BadReport, Collector
+from delta import DeltaReporter
+
+
+def post(collector, body, headers=""):
+    """Send one raw request through serve_connection, returns (status, answer)"""
+    async def exchange():
+        server = await asyncio.start_server(collector.serve_connection, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"POST /client/status HTTP/1.1\r\nContent-Length: {len(body)}\r\n{headers}\r\n".encode() + body)
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        while (await reader.readline()) != b"\r\n":
+            pass
+        answer = json.loads(await reader.read(4096))
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return status, answer
+    return asyncio.run(exchange())
+
+
+@pytest.mark.parametrize("body, headers", [
+    (b"not gzip", "Content-Encoding: gzip\r\n"),
+    (gzip.compress(b'{"computer_name": "pc"}')[:-6], "Content-Encoding: gzip\r\n"),
+    (b"{not json", ""),
+    (b"[1, 2]", ""),
+    (b"null", ""),
+    (json.dumps({"type": "full", "seq": 1, "state": {"computer_name": "pc"}}).encode(), ""),
+    (json.dumps({"type": "full", "seq": 1, "hash": "x"}).encode(), ""),
+])
+def test_bad_reports_are_answered_400(body, headers):
+    collector = Collector()
+    assert post(collector, body, headers) == (400, {"error": "bad report"})
+    assert collector.errors == 1 and collector.agents == {}
+
+
+def test_delta_report_is_acknowledged():
+    collector, reporter = Collector(), DeltaReporter(persist=False)
+    message = reporter.build({"computer_name": "pc", "dok": 1})
+    status, answer = post(collector, gzip.compress(json.dumps(message).encode()), "Content-Encoding: gzip\r\n")
+    assert status == 200 and answer == {"ack": 1, "hash": message["hash"]}
+    assert collector.errors == 0
+
+
+def test_delta_without_state_raises_bad_report():
+    collector, reporter = Collector(), DeltaReporter(persist=False)
+    full = reporter.build({"computer_name": "pc", "dok": 1})
+    reporter.handle_response(*collector.handle_status(json.dumps(full).encode(), None))
+    delta = reporter.build({"computer_name": "pc", "dok": 2})
+    del delta["hash"]
+    with pytest.raises(BadReport):
+        collector.handle_status(json.dumps(delta).encode(), None)
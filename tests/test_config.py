@@ -0,0 +1,99 @@
+import json
+import logging
+
+import pytest
+
+from config import DEFAULTS, load_config
+from executor import CheckExecutor
+from registry import disabled_checks, load_checks
+from scheduler import Scheduler
+
+
+@pytest.fixture
+def write_config(tmp_path, monkeypatch):
+    path = tmp_path / "tracker.json"
+    monkeypatch.setenv("TRACKER_CONFIG", str(path))
+
+    def write(content):
+        path.write_text(content if isinstance(content, str) else json.dumps(content), encoding="utf-8")
+    return write
+
+
+def test_missing_file_gives_the_defaults(write_config):
+    assert load_config() == DEFAULTS
+
+
+def test_settings_override_the_defaults(write_config):
+    write_config({"report_interval": 60, "delta_reporting": True, "checks": {"dok": {"enabled": False}}})
+    config = load_config()
+    assert config["report_interval"] == 60 and config["delta_reporting"] is True
+    assert "dok" not in [check.name for check in load_checks(config)]
+
+
+def test_bad_json_is_logged_and_the_defaults_used(write_config, caplog):
+    write_config('{"report_interval": 60,')
+    with caplog.at_level(logging.ERROR):
+        assert load_config() == DEFAULTS
+    assert "using the defaults" in caplog.text
+
+
+def test_bom_is_accepted(write_config):
+    write_config('\ufeff{"report_interval": 60}')
+    assert load_config()["report_interval"] == 60
+
+
+@pytest.mark.parametrize("content", ["[]", '"60"'])
+def test_not_an_object(write_config, content):
+    write_config(content)
+    assert load_config() == DEFAULTS
+
+
+@pytest.mark.parametrize("key, value", [
+    ("report_interval", "60"), ("report_interval", 0), ("report_interval", True),
+    ("delta_reporting", "yes"), ("metrics_port", "9100"), ("metrics_port", 70000),
+    ("collector_url", 5), ("checks", []), ("checks", {"dok": False}),
+])
+def test_bad_values_keep_the_default(write_config, caplog, key, value):
+    good = {"delta_reporting": True} if key != "delta_reporting" else {"report_interval": 45}
+    write_config(dict(good, **{key: value}))
+    with caplog.at_level(logging.ERROR):
+        config = load_config()
+    assert config[key] == DEFAULTS[key]
+    assert repr(key) in caplog.text
+    # the good setting next to the bad one still applies
+    assert config != DEFAULTS
+
+
+def test_bad_check_overrides_are_dropped(caplog):
+    config = dict(DEFAULTS, checks={"dok": {"interval": "60", "timeout": 5, "enabled": "no"}})
+    with caplog.at_level(logging.ERROR):
+        dok = {check.name: check for check in load_checks(config)}["dok"]
+    assert dok.timeout == 5 and dok.interval == 30
+    assert "'interval'" in caplog.text and "'enabled'" in caplog.text
+
+
+def test_unknown_check_names_are_reported(caplog):
+    config = dict(DEFAULTS, checks={"usb": {"enabled": False}})
+    with caplog.at_level(logging.WARNING):
+        checks = load_checks(config)
+    assert "unknown check 'usb'" in caplog.text
+    assert "dok" in [check.name for check in checks]
+
+
+def test_disabled_checks_report_none_not_the_defaults():
+    config = dict(DEFAULTS, checks={"anti_virus": {"enabled": False}})
+    status = {"computer_name": "pc", "antivirus_installed": False, "antivirus_enabled": False,
+              "antivirus_up_to_date": False, "number_of_connected_doks": 0}
+    checks = [check for check in load_checks(config) if check.name == "dok"]
+    executor = CheckExecutor(max_workers=1)
+    try:
+        scheduler = Scheduler(checks, executor, lambda: status, disabled=disabled_checks(config))
+        report = scheduler.report()
+    finally:
+        executor.shutdown()
+    assert [definition.name for definition in disabled_checks(config)] == ["anti_virus"]
+    assert report["antivirus_installed"] is None
+    assert report["antivirus_enabled"] is None
+    assert report["antivirus_up_to_date"] is None
+    assert report["check_status"] == {"anti_virus": "disabled"}
+
@@ -0,0 +1,86 @@
+import pytest
+
+from delta import (SIDECAR_EVERY, DeltaReporter, ResyncRequired, ack_response, fingerprint, merge_report)
+
+
+def status(**changes):
+    base = {"computer_name": "pc", "dok": 0, "chrome_version": "118", "agent_metrics": {"cycle_seconds": 0.1}}
+    base.update(changes)
+    return base
+
+
+class Server:
+    def __init__(self):
+        self.state = None
+
+    def send(self, reporter, message):
+        try:
+            self.state = merge_report(self.state, message)
+        except ResyncRequired:
+            reporter.handle_response(409, {"resync": True})
+            return
+        reporter.handle_response(200, ack_response(self.state))
+
+
+def test_full_then_delta_then_heartbeat():
+    reporter, server = DeltaReporter(persist=False), Server()
+    messages = []
+    for current in (status(), status(dok=1), status(dok=1)):
+        messages.append(reporter.build(current))
+        server.send(reporter, messages[-1])
+    assert [message["type"] for message in messages] == ["full", "delta", "heartbeat"]
+    assert messages[1]["changed"] == {"dok": 1}
+    assert server.state["status"] == {"computer_name": "pc", "dok": 1, "chrome_version": "118"}
+
+
+def test_agent_metrics_do_not_turn_heartbeats_into_deltas():
+    reporter, server = DeltaReporter(persist=False), Server()
+    types = []
+    for cycle in range(3):
+        message = reporter.build(status(agent_metrics={"cycle_seconds": cycle / 10}))
+        types.append(message["type"])
+        assert "agent_metrics" not in message.get("changed", {})
+        server.send(reporter, message)
+    assert types == ["full", "heartbeat", "heartbeat"]
+    # the hash covers the status without the sidecar
+    assert server.state["status"]["dok"] == 0
+    assert fingerprint(server.state["status"]) == ack_response(server.state)["hash"]
+
+
+def test_sidecar_rides_along_now_and_then():
+    reporter, server = DeltaReporter(persist=False), Server()
+    with_sidecar = []
+    for cycle in range(1, 2 * SIDECAR_EVERY + 1):
+        message = reporter.build(status(agent_metrics={"cycle_seconds": cycle}))
+        if "sidecar" in message:
+            with_sidecar.append(message["seq"])
+        server.send(reporter, message)
+    assert with_sidecar == [1, SIDECAR_EVERY, 2 * SIDECAR_EVERY]
+    assert server.state["sidecar"] == {"agent_metrics": {"cycle_seconds": 2 * SIDECAR_EVERY}}
+
+
+def test_sequence_gap_asks_for_a_full_snapshot():
+    reporter, server = DeltaReporter(persist=False), Server()
+    server.send(reporter, reporter.build(status()))
+    reporter.build(status(dok=1))  # lost on the way
+    lost_base = reporter.build(status(dok=2))
+    server.state["seq"] += 5
+    with pytest.raises(ResyncRequired):
+        merge_report(server.state, lost_base)
+    reporter.handle_response(409, None)
+    assert reporter.build(status(dok=2))["type"] == "full"
+
+
+def test_bare_status_is_kept_as_is():
+    assert merge_report(None, {"computer_name": "pc", "dok": 3})["status"] == {"computer_name": "pc", "dok": 3}
+
+
+@pytest.mark.parametrize("body", [{"ack": [1]}, {"ack": {"seq": 1}}, {"ack": "1"}, {"ack": True}, {"ack": None}, [1], "ok"])
+def test_odd_answers_are_not_acks(body):
+    reporter = DeltaReporter(persist=False)
+    message = reporter.build(status())
+    reporter.handle_response(200, body)
+    assert reporter.acked is None
+    reporter.handle_response(200, {"ack": message["seq"], "hash": message["hash"]})
+    assert reporter.acked_seq == message["seq"]
+
@@ -0,0 +1,60 @@
+import shutil
+import time
+
+import pytest
+
+from executor import ERROR, OK, STALE, TIMEOUT, CheckExecutor
+from scheduler import ScheduledCheck
+from shell_pool import BashDialect, ShellPool
+from utils import run_shell_command, set_shell_pool
+
+
+def check(name, func, timeout=1):
+    return ScheduledCheck(name, func, timeout, interval=30, ttl=90, fields=[])
+
+
+@pytest.fixture
+def executor():
+    executor = CheckExecutor(max_workers=4)
+    yield executor
+    executor.shutdown()
+
+
+def test_statuses(executor):
+    def fails():
+        raise RuntimeError("no")
+
+    statuses = executor.run([check("fast", lambda: None), check("slow", lambda: time.sleep(1), 0.2),
+                             check("bad", fails)])
+    assert statuses == {"fast": OK, "slow": TIMEOUT, "bad": ERROR}
+    assert executor.errors == {"bad": "RuntimeError: no"}
+
+
+def test_timed_out_check_is_stale_after_a_success(executor):
+    delay = [0]
+    slow = check("slow", lambda: time.sleep(delay[0]), 0.2)
+    assert executor.run([slow]) == {"slow": OK}
+    delay[0] = 0.5
+    assert executor.run([slow]) == {"slow": STALE}
+
+
+def test_cycle_takes_as_long_as_the_slowest_check(executor):
+    start = time.monotonic()
+    executor.run([check(f"c{index}", lambda: time.sleep(0.3)) for index in range(4)])
+    assert time.monotonic() - start < 0.6
+
+
+@pytest.mark.skipif(shutil.which("bash") is None, reason="needs bash as the PowerShell stand-in")
+def test_abandoned_check_kills_its_shell(executor):
+    pool = ShellPool(BashDialect(), size=1, timeout=120)
+    set_shell_pool(pool)
+    try:
+        hung = check("hung", lambda: run_shell_command("sleep 30"), 0.3)
+        assert executor.run([hung]) == {"hung": TIMEOUT}
+        # the shell gets the check's deadline, not the pool's 120 seconds
+        time.sleep(0.5)
+        assert pool.sessions == []
+        assert run_shell_command("echo free").stdout == b"free\n"
+        assert executor.abandoned["hung"].done()
+    finally:
+        set_shell_pool(None)
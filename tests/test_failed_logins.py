@@ -0,0 +1,98 @@
+import importlib
+import os
+import subprocess
+from datetime import date
+
+import pytest
+
+import systen_checks
+from parsers import FailedLogin, parse_failed_logins
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+
+class FixedDate(date):
+    @classmethod
+    def today(cls):
+        return cls(2026, 10, 18)
+
+
+def test_counts_per_day_and_cursor_from_a_dump():
+    cursor, counts = systen_checks.count_failed_logins(parse_failed_logins(fixture("failed_logins_4625.json")))
+    assert counts == {"2026-10-16": 1, "2026-10-17": 2, "2026-10-18": 2}
+    assert cursor == {"record_id": 10309, "time": "2026-10-18T06:05:30.2500000Z"}
+
+
+def test_cursor_advances_on_equal_time_and_higher_record_id():
+    time = "2026-10-17T21:40:59.1000000Z"
+    cursor = {"record_id": 10240, "time": time}
+    cursor, counts = systen_checks.count_failed_logins([FailedLogin(10241, time, "2026-10-17")], cursor)
+    assert cursor == {"record_id": 10241, "time": time}
+    assert counts == {"2026-10-17": 1}
+
+
+def test_cursor_follows_time_after_the_log_is_cleared():
+    # record ids restart after Clear-EventLog, only the time condition finds the new events
+    cursor = {"record_id": 98000, "time": "2026-10-17T10:00:00.0000000Z"}
+    command = systen_checks.failed_login_command(cursor)
+    assert "EventRecordID>98000" in command
+    assert "TimeCreated[@SystemTime>'2026-10-17T10:00:00.0000000Z']" in command
+    events = [FailedLogin(3, "2026-10-18T09:00:00.0000000Z", "2026-10-18"),
+              FailedLogin(4, "2026-10-18T09:30:00.0000000Z", "2026-10-18")]
+    cursor, counts = systen_checks.count_failed_logins(events, cursor)
+    assert cursor == {"record_id": 4, "time": "2026-10-18T09:30:00.0000000Z"}
+    assert counts == {"2026-10-18": 2}
+
+
+def test_first_run_looks_back_over_the_window():
+    command = systen_checks.failed_login_command(None)
+    assert f"timediff(@SystemTime) <= {30 * 24 * 60 * 60 * 1000}" in command
+    assert "EventRecordID" not in command
+
+
+def test_merge_drops_days_outside_the_window():
+    days = {"2026-09-18": 4, "2026-09-19": 1, "2026-10-17": 2}
+    counts = {"2026-09-01": 9, "2026-10-17": 1, "2026-10-18": 3}
+    merged = systen_checks.merge_failed_logins(days, counts, date(2026, 10, 18))
+    assert merged == {"2026-09-19": 1, "2026-10-17": 3, "2026-10-18": 3}
+
+
+@pytest.fixture
+def checks(tmp_path, monkeypatch):
+    monkeypatch.setenv("TRACKER_STATE_DIR", str(tmp_path))
+    commands = []
+    outputs = []
+
+    def run_shell_command(command):
+        commands.append(command)
+        return subprocess.CompletedProcess(command, 0, outputs.pop(0), b"")
+
+    def load():
+        module = importlib.reload(systen_checks)
+        monkeypatch.setattr(module, "run_shell_command", run_shell_command)
+        monkeypatch.setattr(module, "date", FixedDate)
+        return module
+
+    yield load, commands, outputs
+    importlib.reload(systen_checks)
+
+
+def test_state_survives_a_restart(checks, tmp_path):
+    load, commands, outputs = checks
+    outputs.append(fixture("failed_logins_4625.json"))
+    module = load()
+    module.login_events()
+    assert module.client_status["failed_login_event"] == {"2026-10-16": 1, "2026-10-17": 2, "2026-10-18": 2}
+    assert (tmp_path / "failed_logins.json").exists()
+
+    # a new process only asks for events after the saved cursor and adds them to the saved counts
+    outputs.append(b'{"id":10310,"utc":"2026-10-18T07:00:00.0000000Z","day":"2026-10-18"}')
+    module = load()
+    module.login_events()
+    assert "EventRecordID>10309" in commands[-1]
+    assert module.client_status["failed_login_event"] == {"2026-10-16": 1, "2026-10-17": 2, "2026-10-18": 3}
@@ -0,0 +1,88 @@
+import os
+
+import pytest
+
+from parsers import (FailedLogin, ParseError, PasswordPolicy, parse_chrome_version, parse_failed_logins,
+                     parse_password_policy, parse_usb_devices, records)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("name, count", [
+    ("usb_devices_one.json", 1),
+    ("usb_devices_array.json", 2),
+    ("usb_devices_bom_non_ascii.json", 2),
+    ("empty_output.txt", 0),
+])
+def test_usb_devices(name, count):
+    assert parse_usb_devices(fixture(name)) == count
+
+
+def test_bom_and_non_ascii_names_are_decoded():
+    names = [device["FriendlyName"] for device in records(fixture("usb_devices_bom_non_ascii.json"))]
+    assert names == ["Clé USB Générique USB Device", "Флешка USB Device"]
+
+
+def test_empty_output_is_no_records():
+    assert parse_usb_devices(b"") == 0
+    assert parse_chrome_version(fixture("empty_output.txt")) is None
+    assert parse_failed_logins(fixture("empty_output.txt")) == []
+
+
+@pytest.mark.parametrize("parser", [parse_usb_devices, parse_chrome_version,
+                                    parse_password_policy, parse_failed_logins])
+def test_malformed_json_raises(parser):
+    with pytest.raises(ParseError, match="not json"):
+        parser(fixture("malformed.json"))
+
+
+@pytest.mark.parametrize("parser", [parse_usb_devices, parse_chrome_version, parse_failed_logins])
+def test_scalar_json_raises(parser):
+    with pytest.raises(ParseError, match="expected an object or a list"):
+        parser(b"42\r\n")
+
+
+def test_password_policy():
+    assert parse_password_policy(fixture("password_policy.json")) == PasswordPolicy(42, 8)
+
+
+def test_password_policy_that_never_expires():
+    assert parse_password_policy(fixture("password_policy_never_expires.json")) == PasswordPolicy(-1, 0)
+
+
+@pytest.mark.parametrize("output, message", [
+    (b"", "no password policy"),
+    (b"[]", "no password policy"),
+    (b'{"MaximumPasswordAge":42}', "bad password policy"),
+    (b'{"MaximumPasswordAge":"never","MinimumPasswordLength":8}', "bad password policy"),
+])
+def test_bad_password_policy_raises(output, message):
+    with pytest.raises(ParseError, match=message):
+        parse_password_policy(output)
+
+
+def test_chrome_version():
+    assert parse_chrome_version(fixture("chrome_version.json")) == "118.0.5993.118"
+    assert parse_chrome_version(b'{"DisplayVersion":null}') is None
+
+
+def test_failed_logins_from_a_4625_dump():
+    events = parse_failed_logins(fixture("failed_logins_4625.json"))
+    assert len(events) == 5
+    assert events[0] == FailedLogin(10231, "2026-10-16T08:12:03.4410000Z", "2026-10-16")
+
+
+def test_one_failed_login_is_a_lone_object():
+    assert parse_failed_logins(b'{"id":7,"utc":"2026-10-18T06:01:00Z","day":"2026-10-18"}') == \
+        [FailedLogin(7, "2026-10-18T06:01:00Z", "2026-10-18")]
+
+
+@pytest.mark.parametrize("output", [b'[{"id":7,"day":"2026-10-18"}]', b'[{"id":"x","utc":"","day":""}]', b"[1]"])
+def test_bad_failed_login_raises(output):
+    with pytest.raises(ParseError, match="bad failed login event"):
+        parse_failed_logins(output)
@@ -0,0 +1,128 @@
+import time
+
+import pytest
+
+from executor import CheckExecutor
+from registry import CHECKS
+from scheduler import ScheduledCheck, Scheduler
+
+
+@pytest.fixture
+def executor():
+    executor = CheckExecutor(max_workers=4)
+    yield executor
+    executor.shutdown()
+
+
+def make_scheduler(executor, checks, status):
+    scheduler = Scheduler(checks, executor, lambda: status, jitter=0, report_interval=3600)
+    # take the first report out of the way so only the checks set seconds_until_next
+    assert scheduler.report_due()
+    return scheduler
+
+
+def test_only_due_checks_run(executor):
+    runs = []
+    status = {"computer_name": "pc", "a": None, "b": None}
+    checks = [ScheduledCheck("a", lambda: runs.append("a"), 1, interval=0.2, ttl=1, fields=["a"]),
+              ScheduledCheck("b", lambda: runs.append("b"), 1, interval=60, ttl=120, fields=["b"])]
+    scheduler = make_scheduler(executor, checks, status)
+    scheduler.run_due()
+    assert scheduler.run_due() == {}
+    time.sleep(scheduler.seconds_until_next())
+    assert scheduler.run_due() == {"a": "ok"}
+    assert sorted(runs) == ["a", "a", "b"]
+
+
+def test_next_run_counts_from_the_cycle_start(executor):
+    status = {"a": None}
+    checks = [ScheduledCheck("a", lambda: time.sleep(0.2), 1, interval=1, ttl=2, fields=["a"])]
+    scheduler = make_scheduler(executor, checks, status)
+    start = time.monotonic()
+    scheduler.run_due()
+    # the check took 0.2 s, the next run is still one interval after the start
+    assert scheduler.seconds_until_next() == pytest.approx(1 - (time.monotonic() - start), abs=0.05)
+
+
+def test_report_uses_cached_values_and_expires_them(executor):
+    status = {"computer_name": "pc", "a": None}
+
+    def check_a():
+        status["a"] = 1
+
+    scheduler = make_scheduler(executor, [ScheduledCheck("a", check_a, 1, interval=60, ttl=0.1, fields=["a"])],
+                               status)
+    scheduler.run_due()
+    status["a"] = "written later"
+    report = scheduler.report()
+    assert report["a"] == 1
+    assert report["computer_name"] == "pc"
+    assert report["check_status"] == {"a": "ok"}
+    time.sleep(0.15)
+    assert scheduler.report()["check_status"] == {"a": "stale"}
+
+
+def test_partial_writes_of_an_abandoned_check_are_not_reported(executor):
+    status = {"installed": False, "enabled": False}
+
+    def hangs_half_way():
+        status["installed"] = True
+        time.sleep(1)
+        status["enabled"] = True
+
+    check = ScheduledCheck("anti_virus", hangs_half_way, 0.2, interval=60, ttl=120, fields=["installed", "enabled"])
+    scheduler = make_scheduler(executor, [check], status)
+    assert scheduler.run_due() == {"anti_virus": "timeout"}
+    report = scheduler.report()
+    assert report["installed"] is None
+    assert report["enabled"] is None
+    assert report["check_status"] == {"anti_virus": "timeout"}
+
+
+def test_refresh_makes_a_check_due(executor):
+    status = {"a": None}
+    scheduler = make_scheduler(executor, [ScheduledCheck("a", lambda: None, 1, 60, 120, ["a"])], status)
+    scheduler.run_due()
+    scheduler.refresh(["a"])
+    assert scheduler.seconds_until_next() == 0
+    assert scheduler.run_due() == {"a": "ok"}
+
+
+def test_refresh_matches_whole_names(executor):
+    status = {"a": None}
+    checks = [ScheduledCheck("dok", lambda: None, 1, 60, 120, ["a"])]
+    scheduler = make_scheduler(executor, checks, status)
+    scheduler.run_due()
+    scheduler.refresh(["do"])
+    assert scheduler.seconds_until_next() > 0
+    scheduler.refresh(("dok",))
+    assert scheduler.seconds_until_next() == 0
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.parametrize("report_interval, expected", [(30, 120), (300, 12)])
+def test_reports_follow_the_report_interval_not_the_checks(executor, report_interval, expected):
+    # the service loop over one simulated hour with the stock check intervals
+    clock = FakeClock()
+    runs = {}
+    checks = [ScheduledCheck(definition.name, lambda name=definition.name: runs.update({name: runs.get(name, 0) + 1}),
+                             definition.timeout, definition.interval, definition.ttl, definition.fields)
+              for definition in CHECKS]
+    scheduler = Scheduler(checks, executor, lambda: {}, report_interval=report_interval, clock=clock)
+    reports = 0
+    while clock.now < 3600:
+        scheduler.run_due()
+        if scheduler.report_due():
+            reports += 1
+        clock.now += max(scheduler.seconds_until_next(), 1e-3)
+    assert expected * 0.9 <= reports <= expected * 1.1
+    # the 30 second checks still ran on their own schedule
+    assert 110 <= runs["dok"] <= 135
+
@@ -0,0 +1,78 @@
+import shutil
+import subprocess
+import threading
+import time
+
+import pytest
+
+from shell_pool import BashDialect, ShellPool
+
+pytestmark = pytest.mark.skipif(shutil.which("bash") is None, reason="needs bash as the PowerShell stand-in")
+
+
+@pytest.fixture
+def pool():
+    pool = ShellPool(BashDialect(), size=2, timeout=5)
+    yield pool
+    pool.close()
+
+
+def test_stdout_stderr_and_exit_code_are_framed(pool):
+    result = pool.run("echo out; echo err >&2; (exit 3)")
+    assert result.stdout == b"out\n"
+    assert result.stderr == b"err\n"
+    assert result.returncode == 3
+
+
+def test_output_without_trailing_newline(pool):
+    assert pool.run("printf no-newline").stdout == b"no-newline"
+    assert pool.run("echo next").stdout == b"next\n"
+
+
+def test_shell_is_reused_between_commands(pool):
+    first = pool.run("echo $$").stdout
+    assert pool.run("echo $$").stdout == first
+    assert len(pool.sessions) == 1
+
+
+def test_timeout_kills_and_replaces_the_shell(pool):
+    pool.run("true")
+    hung = pool.sessions[0]
+    with pytest.raises(subprocess.TimeoutExpired):
+        pool.run("sleep 10", timeout=0.3)
+    assert not hung.is_alive()
+    assert hung not in pool.sessions
+    assert pool.run("echo alive").stdout == b"alive\n"
+
+
+def test_shell_exiting_mid_command(pool):
+    result = pool.run("echo before; exit 7")
+    assert result.stdout == b"before\n"
+    assert result.returncode == 7
+    assert pool.run("echo again").returncode == 0
+
+
+def test_command_reading_stdin_ends_the_session(pool):
+    # cat eats the frame that follows it, the session cannot be trusted afterwards
+    result = pool.run("cat", timeout=2)
+    assert result.returncode != 0
+    assert pool.run("echo fine").stdout == b"fine\n"
+
+
+def test_concurrent_use_up_to_size(pool):
+    results = []
+
+    def run():
+        results.append(pool.run("sleep 0.5; echo done").stdout)
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+    assert results == [b"done\n"] * 4
+    # two shells, four commands: two rounds, not one and not four
+    assert 1.0 <= elapsed < 1.9
+    assert len(pool.sessions) <= 2
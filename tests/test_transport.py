@@ -0,0 +1,225 @@
+import os
+import time
+
+import pytest
+
+from delta import DeltaReporter
+from standin_collector import StandinCollector
+from transport import Spool, StatusTransport
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out waiting")
+        time.sleep(0.01)
+
+
+def report(index, size=0):
+    return {"computer_name": "pc", "n": index, "pad": "x" * size}
+
+
+@pytest.fixture
+def spool(tmp_path):
+    return Spool(str(tmp_path / "spool.jsonl"))
+
+
+@pytest.fixture
+def standin():
+    standin = StandinCollector()
+    yield standin
+    standin.close()
+
+
+@pytest.fixture
+def make_transport(spool):
+    transports = []
+
+    def make(url, **kwargs):
+        kwargs.setdefault("backoff_base", 0.01)
+        kwargs.setdefault("backoff_max", 0.05)
+        transport = StatusTransport(url, spool=spool, **kwargs)
+        transports.append(transport)
+        transport.start()
+        return transport
+
+    yield make
+    for transport in transports:
+        transport.stop()
+
+
+# spool
+
+
+def test_spool_keeps_reports_across_restarts(spool):
+    for index in range(3):
+        spool.append(report(index))
+    (_, end), = spool.peek(1)
+    spool.commit(end)
+    reopened = Spool(spool.path)
+    assert len(reopened) == 2
+    assert [record["n"] for record, _ in reopened.peek(10)] == [1, 2]
+
+
+def test_overflow_keeps_the_file_small(tmp_path):
+    spool = Spool(str(tmp_path / "spool.jsonl"), max_records=10)
+    for index in range(5000):
+        spool.append(report(index, size=500))
+    assert len(spool) <= 10
+    assert os.path.getsize(spool.path) < 11 * 600
+    records = [record["n"] for record, _ in spool.peek(100)]
+    assert records == list(range(5000 - len(records), 5000))
+
+
+def test_dead_prefix_is_compacted(tmp_path):
+    spool = Spool(str(tmp_path / "spool.jsonl"), compact_bytes=4096)
+    for index in range(50):
+        spool.append(report(index, size=200))
+    for record, end in spool.peek(30):
+        spool.commit(end)
+    # at most compact_bytes of delivered reports stay in front of the 20 pending ones
+    assert spool.offset < 4096
+    assert os.path.getsize(spool.path) < 4096 + 20 * 260
+    # offsets handed out before the compaction still work
+    pending = spool.peek(20)
+    assert [record["n"] for record, _ in pending] == list(range(30, 50))
+    spool.commit(pending[4][1])
+    assert [record["n"] for record, _ in spool.peek(1)] == [35]
+    assert len(spool) == 15
+
+
+def test_commit_after_overflow_dropped_the_reports_in_flight(tmp_path):
+    spool = Spool(str(tmp_path / "spool.jsonl"), max_records=10)
+    for index in range(10):
+        spool.append(report(index))
+    in_flight = spool.peek(5)
+    # the collector is slow, meanwhile the spool overflows and drops what is being sent
+    for index in range(10, 20):
+        spool.append(report(index))
+    offset = spool.offset
+    spool.commit(in_flight[-1][1])
+    assert spool.offset == offset
+    assert len(spool) == len(spool.peek(100))
+    delivered = []
+    while len(spool):
+        for record, end in spool.peek(3):
+            delivered.append(record["n"])
+            spool.commit(end)
+    assert delivered == sorted(set(delivered))
+    assert delivered[-1] == 19
+    assert Spool(spool.path).peek(100) == []
+
+
+# transport against the stand-in collector
+
+
+def test_submit_never_blocks_while_the_collector_hangs(standin, make_transport):
+    standin.script = ["hang"]
+    transport = make_transport(standin.url, timeout=30)
+    for index in range(20):
+        start = time.monotonic()
+        transport.submit(report(index))
+        assert time.monotonic() - start < 0.05
+    standin.release()
+    wait_until(lambda: len(transport.spool) == 0)
+    assert [message["n"] for message in standin.received] == list(range(20))
+
+
+def test_server_errors_back_off_and_keep_the_report(standin, make_transport):
+    standin.script = [503, 429, 500]
+    transport = make_transport(standin.url)
+    transport.submit(report(1))
+    wait_until(lambda: len(standin.received) == 1)
+    assert standin.received[0]["n"] == 1
+    assert standin.script == []
+    wait_until(lambda: len(transport.spool) == 0)
+
+
+def test_the_spool_passed_in_is_used_even_when_empty(spool, tmp_path, monkeypatch):
+    monkeypatch.setenv("TRACKER_STATE_DIR", str(tmp_path / "state"))
+    transport = StatusTransport("http://127.0.0.1:9/", spool=spool)
+    assert len(spool) == 0
+    assert transport.spool is spool
+
+
+def test_backoff_grows_with_failures_and_is_bounded(spool):
+    transport = StatusTransport("http://127.0.0.1:9/", spool=spool, backoff_base=1, backoff_max=8)
+    transport.failures = 1
+    assert all(1 <= transport.backoff() <= 2 for _ in range(50))
+    transport.failures = 20
+    assert all(1 <= transport.backoff() <= 8 for _ in range(50))
+
+
+def test_conflict_rebuilds_a_full_snapshot(standin, make_transport):
+    reporter = DeltaReporter(persist=False)
+    transport = make_transport(standin.url, encode=reporter.build, on_response=reporter.handle_response)
+    transport.submit(report(1))
+    wait_until(lambda: reporter.acked_seq is not None)
+    # the collector lost its state, the delta it gets next cannot be applied
+    standin.collector.agents.clear()
+    transport.submit(report(2))
+    wait_until(lambda: len(standin.received) == 3)
+    assert [message["type"] for message in standin.received] == ["full", "delta", "full"]
+    assert standin.collector.agents["pc"]["status"]["n"] == 2
+
+
+def test_bodies_are_gzip(standin, make_transport):
+    transport = make_transport(standin.url)
+    transport.submit(report(1))
+    wait_until(lambda: len(standin.received) == 1)
+    assert standin.encodings == ["gzip"]
+    assert standin.received[0] == report(1)
+
+
+def test_backlog_drains_after_recovery(standin, make_transport):
+    standin.script = [503] * 5
+    transport = make_transport(standin.url, batch_size=7)
+    for index in range(30):
+        transport.submit(report(index))
+    wait_until(lambda: len(transport.spool) == 0)
+    assert [message["n"] for message in standin.received] == list(range(30))
+
+
+def test_latency_does_not_lose_reports(make_transport):
+    standin = StandinCollector(latency=0.05)
+    try:
+        transport = make_transport(standin.url)
+        for index in range(5):
+            transport.submit(report(index))
+        wait_until(lambda: len(transport.spool) == 0)
+        assert [message["n"] for message in standin.received] == list(range(5))
+    finally:
+        standin.close()
+
+
+def test_a_failing_response_handler_does_not_stop_the_uploads(standin, make_transport):
+    calls = []
+
+    def on_response(status_code, body):
+        calls.append(status_code)
+        if len(calls) == 1:
+            raise TypeError("bad answer")
+
+    transport = make_transport(standin.url, on_response=on_response)
+    transport.submit(report(1))
+    wait_until(lambda: len(calls) == 1)
+    transport.submit(report(2))
+    wait_until(lambda: len(transport.spool) == 0)
+    assert [message["n"] for message in standin.received] == [1, 2]
+    assert transport.thread.is_alive()
+
+
+def test_a_report_that_cannot_be_encoded_is_dropped(standin, make_transport):
+    def encode(status):
+        if status["n"] == 1:
+            raise ValueError("cannot encode")
+        return status
+
+    transport = make_transport(standin.url, encode=encode)
+    for index in range(3):
+        transport.submit(report(index))
+    wait_until(lambda: len(transport.spool) == 0)
+    assert [message["n"] for message in standin.received] == [0, 2]
+    assert transport.thread.is_alive()
+
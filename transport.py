@@ -0,0 +1,241 @@
+import gzip
+import json
+import logging
+import os
+import random
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import metrics, SIZE_BUCKETS
+from state import state_dir
+
+log = logging.getLogger(__name__)
+
+class Spool:
+    """Append only file of reports waiting for the collector.
+
+    Reports are appended as json lines and the offset of the first report not
+    yet delivered is kept next to it, so nothing is lost when the service stops
+    while the collector is down. The delivered (or dropped) prefix is cut off
+    once everything is sent, when it passes compact_bytes, or when the spool
+    overflows, so the file stays around max_records reports.
+
+    Offsets handed out by peek() count from the first byte ever written in this
+    process, so they stay valid after the file is compacted.
+    """
+
+    def __init__(self, path=None, max_records=2000, compact_bytes=1 << 20):
+        self.path = path or os.path.join(state_dir(), "spool.jsonl")
+        self.offset_path = self.path + ".offset"
+        self.max_records = max_records
+        self.compact_bytes = compact_bytes
+        self.lock = threading.Lock()
+        self.offset = self._read_offset()
+        # bytes cut off the front of the file since start
+        self.base = 0
+        self.pending = len(self._read(self.offset))
+
+    def append(self, record):
+        line = json.dumps(record, separators=(",", ":")).encode() + b"\n"
+        with self.lock:
+            with open(self.path, "ab") as f:
+                f.write(line)
+            self.pending += 1
+            if self.pending > self.max_records:
+                # drop the oldest reports rather than grow without limit, a tenth at a
+                # time so the file is not rewritten on every append
+                drop = self.pending - self.max_records + self.max_records // 10
+                records = self._read(self.offset, drop)
+                self._advance(records[-1][1], compact=True)
+
+    def peek(self, count):
+        """The next `count` reports as (record, end offset) pairs"""
+        with self.lock:
+            return [(record, end + self.base) for record, end in self._read(self.offset, count)]
+
+    def commit(self, end_offset):
+        """Forget every report up to end_offset, they were delivered"""
+        with self.lock:
+            end = end_offset - self.base
+            # the reports may have been dropped by an overflow while they were being sent
+            if end > self.offset:
+                self._advance(end)
+
+    def __len__(self):
+        return self.pending
+
+    def _advance(self, end, compact=False):
+        self.pending -= len(self._read(self.offset, end_offset=end))
+        self.offset = end
+        if self.pending == 0:
+            with open(self.path, "wb"):
+                pass
+            self._cut(self.offset)
+        elif compact or self.offset >= self.compact_bytes:
+            with open(self.path, "rb") as f:
+                f.seek(self.offset)
+                rest = f.read()
+            with open(self.path + ".tmp", "wb") as f:
+                f.write(rest)
+            os.replace(self.path + ".tmp", self.path)
+            self._cut(self.offset)
+        with open(self.offset_path, "w") as f:
+            f.write(str(self.offset))
+
+    def _cut(self, size):
+        self.base += size
+        self.offset = 0
+
+    def _read(self, offset, count=None, end_offset=None):
+        records = []
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                while count is None or len(records) < count:
+                    if end_offset is not None and f.tell() >= end_offset:
+                        break
+                    line = f.readline()
+                    if not line.endswith(b"\n"):
+                        # nothing more, or a line cut short by a crash while appending
+                        break
+                    try:
+                        records.append((json.loads(line), f.tell()))
+                    except ValueError:
+                        continue
+        except OSError:
+            pass
+        return records
+
+    def _read_offset(self):
+        try:
+            with open(self.offset_path) as f:
+                offset = int(f.read())
+            return offset if offset <= os.path.getsize(self.path) else 0
+        except (OSError, ValueError):
+            return 0
+
+
+class StatusTransport:
+    """Uploads reports from a background thread so a check cycle never waits on the network.
+
+    submit() only appends to the spool. The sender thread drains it in batches
+    over one keep-alive session with gzip bodies, and backs off exponentially
+    with jitter while the collector is unreachable.
+
+    encode turns a spooled status into the message to post (e.g. DeltaReporter.build)
+    and on_response gets (status code, json body) of every answer.
+    """
+
+    def __init__(self, url, spool=None, encode=None, on_response=None, session=None, timeout=10, compress=True,
+                 batch_size=20, backoff_base=1, backoff_max=300):
+        self.url = url
+        # an empty Spool is falsy, so test for None
+        self.spool = spool if spool is not None else Spool()
+        self.encode = encode
+        self.on_response = on_response
+        self.session = session or _make_session()
+        self.timeout = timeout
+        self.compress = compress
+        self.batch_size = batch_size
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failures = 0
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def submit(self, status):
+        self.spool.append(status)
+        self.wakeup.set()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="transport", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=5):
+        self.stopping.set()
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+        self.session.close()
+
+    def _run(self):
+        while not self.stopping.is_set():
+            self.wakeup.wait()
+            self.wakeup.clear()
+            while len(self.spool) and not self.stopping.is_set():
+                try:
+                    delivered = self.drain_batch()
+                except Exception:
+                    # e.g. the spool file cannot be read, the thread must live on or nothing is sent again
+                    log.exception("sending the spooled reports failed")
+                    delivered = False
+                if delivered:
+                    self.failures = 0
+                    continue
+                self.failures += 1
+                if self.stopping.wait(self.backoff()):
+                    return
+
+    def backoff(self):
+        ceiling = min(self.backoff_max, self.backoff_base * 2 ** min(self.failures, 30))
+        return random.uniform(self.backoff_base, max(self.backoff_base, ceiling))
+
+    def drain_batch(self):
+        """Send up to batch_size spooled reports, returns False when the collector is unreachable"""
+        for status, end_offset in self.spool.peek(self.batch_size):
+            if not self._deliver(status):
+                return False
+            self.spool.commit(end_offset)
+        return True
+
+    def _deliver(self, status):
+        # a 409 asks for a full snapshot, which the encoder builds on the second try
+        for _ in range(2):
+            with metrics.timer("serialize_seconds"):
+                try:
+                    message = self.encode(status) if self.encode else status
+                    body = json.dumps(message, separators=(",", ":")).encode()
+                except Exception:
+                    # it would fail the same way every time, drop it rather than block the spool
+                    log.exception("cannot encode a report, it is dropped")
+                    metrics.increment("upload_errors_total", kind="encode")
+                    return True
+                headers = {"Content-Type": "application/json"}
+                if self.compress:
+                    body = gzip.compress(body)
+                    headers["Content-Encoding"] = "gzip"
+            metrics.observe("report_bytes", len(body), buckets=SIZE_BUCKETS)
+            try:
+                with metrics.timer("upload_seconds"):
+                    response = self.session.post(self.url, data=body, headers=headers, timeout=self.timeout)
+            except requests.RequestException as error:
+                metrics.increment("upload_errors_total", kind=type(error).__name__)
+                return False
+            if self.on_response is not None:
+                try:
+                    answer = response.json()
+                except ValueError:
+                    answer = None
+                try:
+                    self.on_response(response.status_code, answer)
+                except Exception:
+                    log.exception("handling the answer %s %r failed", response.status_code, answer)
+            if response.status_code == 409:
+                continue
+            if response.status_code >= 400:
+                metrics.increment("upload_errors_total", kind=str(response.status_code))
+            if response.status_code >= 500 or response.status_code == 429:
+                return False
+            # delivered, or rejected in a way that sending it again will not fix
+            return True
+        return True
+
+
+def _make_session():
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+    session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+    return session
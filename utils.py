@@ -1,18 +1,37 @@
+import atexit
 import subprocess
+import threading
 
-def make_list_from_data(data):
-    strOutput = data
-    listRes = list(strOutput.split("\n"))
-    return listRes
-
-
-def run_shell_command(command):
-    output = subprocess.run([
-        'powershell.exe',
-        '-noprofile',
-        '-executionpolicy',
-        '-bypass',
-        '-c',
-        command],
-        capture_output=True)
-    return output
+from executor import remaining_time
+from shell_pool import ShellPool
+
+_shell_pool = None
+_shell_pool_lock = threading.Lock()
+
+
+def get_shell_pool():
+    global _shell_pool
+    with _shell_pool_lock:
+        if _shell_pool is None:
+            _shell_pool = ShellPool(size=4)
+            atexit.register(_shell_pool.close)
+        return _shell_pool
+
+
+def set_shell_pool(pool):
+    """Swap the runner behind run_shell_command, e.g. ShellPool(BashDialect()) on Linux"""
+    global _shell_pool
+    with _shell_pool_lock:
+        old_pool, _shell_pool = _shell_pool, pool
+    if old_pool is not None and old_pool is not pool:
+        old_pool.close()
+
+
+def run_shell_command(command, timeout=None):
+    # inside a check the command gets what is left of the check's deadline, so a hung
+    # shell is killed when the check is abandoned instead of holding a pool slot
+    if timeout is None:
+        timeout = remaining_time()
+        if timeout is not None and timeout <= 0:
+            raise subprocess.TimeoutExpired(command, 0)
+    return get_shell_pool().run(command, timeout=timeout)